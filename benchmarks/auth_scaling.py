@@ -0,0 +1,288 @@
+"""Multi-thread and multi-process scaling benchmark of the auth layer.
+
+Drives the WSGI callable of a protected Dash app from N threads in each
+of M processes, with a mix of asset, layout, page and callback requests,
+and reports the throughput and tail latency for each auth class. Lock or GIL
+contention in the auth path shows up as throughput that does not scale
+with the number of threads/processes, and as growing tail latencies.
+
+Usage:
+    python -m benchmarks.auth_scaling --auths none,basic,oidc \
+        --threads 1,2,4,8 --processes 1,2,4 --requests 4000
+"""
+import argparse
+import base64
+import io
+import multiprocessing
+import random
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+from dash import Dash, Input, Output, dcc, html
+from werkzeug.test import EnvironBuilder
+
+from dash_auth import APIKeyAuth, BasicAuth, OIDCAuth, hash_api_key
+
+AUTHS = ("none", "basic", "api_key", "oidc")
+# Share of each request kind. "asset" (favicon) and "layout" requests hit
+# Dash's public routes, only "page" (index) and "callback" requests are
+# checked by the auth class
+DEFAULT_MIX = {"asset": 0.2, "layout": 0.1, "page": 0.2, "callback": 0.5}
+CALLBACK_BODY = {
+    "output": "output.children",
+    "outputs": {"id": "output", "property": "children"},
+    "inputs": [{"id": "input", "property": "value", "value": "hello"}],
+    "changedPropIds": ["input.value"],
+    "state": [],
+}
+
+
+def create_app(auth: str):
+    """Create a Dash app protected by the given auth class, and the
+    headers authenticating its requests."""
+    app = Dash(__name__)
+    app.layout = html.Div([dcc.Input(id="input"), html.Div(id="output")])
+
+    @app.callback(Output("output", "children"), Input("input", "value"))
+    def echo(value):
+        return value
+
+    # Dash's own routes (scripts, favicon...) are public
+    headers = {}
+    if auth == "basic":
+        BasicAuth(
+            app,
+            {"user": "password"},
+            secret_key="benchmark",
+            public_routes=[],
+        )
+        credentials = base64.b64encode(b"user:password").decode()
+        headers["Authorization"] = f"Basic {credentials}"
+    elif auth == "api_key":
+        APIKeyAuth(app, {"bot": hash_api_key("key")}, public_routes=[])
+        headers["X-API-Key"] = "key"
+    elif auth == "oidc":
+        OIDCAuth(app, secret_key="benchmark", public_routes=[])
+        client = app.server.test_client()
+        with client.session_transaction() as session:
+            session["user"] = {"email": "user@mail.com", "groups": []}
+            session["idp"] = "idp"
+        cookie = client.get_cookie("session")
+        headers["Cookie"] = f"session={cookie.value}"
+    elif auth != "none":
+        raise ValueError(f"Unknown auth: {auth}")
+    return app, headers
+
+
+def _environs(headers: dict) -> Dict[str, dict]:
+    """Template WSGI environs of each request kind."""
+    requests = {
+        "asset": EnvironBuilder("/_favicon.ico", headers=headers),
+        "layout": EnvironBuilder("/_dash-layout", headers=headers),
+        "page": EnvironBuilder("/", headers=headers),
+        "callback": EnvironBuilder(
+            "/_dash-update-component",
+            method="POST",
+            json=CALLBACK_BODY,
+            headers=headers,
+        ),
+    }
+    environs = {}
+    for kind, builder in requests.items():
+        environ = builder.get_environ()
+        environ["_body"] = environ["wsgi.input"].read()
+        environs[kind] = environ
+    return environs
+
+
+def _call(wsgi_app, template: dict) -> float:
+    environ = dict(template)
+    environ["wsgi.input"] = io.BytesIO(environ.pop("_body"))
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(status)
+
+    start = time.perf_counter()
+    body = wsgi_app(environ, start_response)
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+    elapsed = time.perf_counter() - start
+    if not statuses[0].startswith("200"):
+        raise RuntimeError(f"Unexpected status {statuses[0]}")
+    return elapsed
+
+
+def _worker(
+    auth: str,
+    threads: int,
+    n_requests: int,
+    mix: Dict[str, float],
+    seed: int,
+    barrier=None,
+) -> dict:
+    """Run requests from several threads in the current process."""
+    app, headers = create_app(auth)
+    environs = _environs(headers)
+    wsgi_app = app.server.wsgi_app
+    # Warm up: Dash sets itself up on its first request
+    for template in environs.values():
+        _call(wsgi_app, template)
+
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=n_requests)
+    latencies = [[] for _ in range(threads)]
+    thread_barrier = threading.Barrier(threads + 1)
+
+    def run(i):
+        thread_barrier.wait()
+        for kind in kinds[i::threads]:
+            latencies[i].append(_call(wsgi_app, environs[kind]))
+
+    workers = [
+        threading.Thread(target=run, args=(i,)) for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    if barrier is not None:
+        barrier.wait()
+    start = time.monotonic()
+    thread_barrier.wait()
+    for worker in workers:
+        worker.join()
+    return {
+        "start": start,
+        "end": time.monotonic(),
+        "latencies": [x for thread in latencies for x in thread],
+    }
+
+
+# Barriers inherited by forked worker processes
+_BARRIERS = {}
+
+
+def _process_worker(args):
+    *args, barrier = args
+    return _worker(*args, barrier=_BARRIERS[barrier])
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def run(
+    auth: str = "basic",
+    threads: int = 1,
+    processes: int = 1,
+    requests: int = 1000,
+    mix: Dict[str, float] = None,
+) -> dict:
+    """Run the benchmark for one auth class and concurrency level.
+
+    :param auth: Auth class, one of "none", "basic", "api_key", "oidc"
+    :param threads: Number of threads per process
+    :param processes: Number of processes
+    :param requests: Total number of requests
+    :param mix: Share of each request kind ("asset", "layout", "page",
+        "callback"), see `DEFAULT_MIX`
+    :return: dict with the throughput (`requests_per_sec`) and the
+        p50/p99/max latency (in ms)
+    """
+    mix = mix or DEFAULT_MIX
+    per_process = requests // processes
+    if processes == 1:
+        results = [_worker(auth, threads, per_process, mix, seed=0)]
+    else:
+        context = multiprocessing.get_context("fork")
+        key = id(context)
+        _BARRIERS[key] = context.Barrier(processes)
+        try:
+            with context.Pool(processes) as pool:
+                # One task per worker, all waiting on the barrier
+                results = pool.map(_process_worker, [
+                    (auth, threads, per_process, mix, seed, key)
+                    for seed in range(processes)
+                ], chunksize=1)
+        finally:
+            del _BARRIERS[key]
+    latencies = [x * 1000 for result in results for x in result["latencies"]]
+    elapsed = (
+        max(result["end"] for result in results)
+        - min(result["start"] for result in results)
+    )
+    return {
+        "auth": auth,
+        "threads": threads,
+        "processes": processes,
+        "requests": len(latencies),
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": _percentile(latencies, 0.99),
+        "max": max(latencies),
+    }
+
+
+def scaling(
+    auths: List[str],
+    threads: List[int],
+    processes: List[int],
+    requests: int = 1000,
+) -> List[dict]:
+    """Run the benchmark for each auth class and concurrency level.
+
+    Each report also has the `efficiency` of the concurrency level: its
+    throughput divided by the single-thread throughput times the number
+    of threads and processes (1.0 is linear scaling).
+    """
+    reports = []
+    for auth in auths:
+        baseline = None
+        for n_processes in processes:
+            for n_threads in threads:
+                report = run(auth, n_threads, n_processes, requests)
+                if baseline is None:
+                    baseline = report["requests_per_sec"] / (
+                        n_threads * n_processes
+                    )
+                report["efficiency"] = report["requests_per_sec"] / (
+                    baseline * n_threads * n_processes
+                )
+                reports.append(report)
+    return reports
+
+
+def main():
+    def int_list(value):
+        return [int(x) for x in value.split(",")]
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--auths", default=",".join(AUTHS))
+    parser.add_argument("--threads", type=int_list, default=[1, 2, 4, 8])
+    parser.add_argument("--processes", type=int_list, default=[1, 2])
+    parser.add_argument("--requests", type=int, default=4000)
+    args = parser.parse_args()
+
+    print(
+        f"{'auth':<10}{'procs':>6}{'threads':>8}{'req/s':>10}"
+        f"{'efficiency':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}"
+    )
+    for report in scaling(
+        args.auths.split(","), args.threads, args.processes, args.requests
+    ):
+        print(
+            f"{report['auth']:<10}{report['processes']:>6}"
+            f"{report['threads']:>8}{report['requests_per_sec']:>10.0f}"
+            f"{report['efficiency']:>12.2f}{report['p50']:>10.2f}"
+            f"{report['p99']:>10.2f}{report['max']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""End-to-end OIDC login throughput benchmark.
+
+Drives concurrent full login dances against a local OIDC provider:
+`OIDCAuth.login_request` -> provider authorize -> `OIDCAuth.callback`
+(token exchange and ID token validation) -> `OIDCAuth.after_logged_in`.
+
+Usage:
+    python -m benchmarks.oidc_login --logins 500 --concurrency 16
+"""
+import argparse
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from dash import Dash, html
+
+from dash_auth import OIDCAuth
+from .oidc_provider import FakeOIDCProvider
+
+STEPS = ("login_request", "authorize", "callback", "after_logged_in")
+
+
+class _TimedOIDCAuth(OIDCAuth):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = threading.local()
+
+    def after_logged_in(self, user, idp, token):
+        start = time.perf_counter()
+        try:
+            return super().after_logged_in(user, idp, token)
+        finally:
+            self.timings.after_logged_in = time.perf_counter() - start
+
+
+def _login(oidc: _TimedOIDCAuth, idp_session: requests.Session) -> dict:
+    timings = {}
+    client = oidc.app.server.test_client()
+
+    start = time.perf_counter()
+    resp = client.get("/oidc/idp/login")
+    timings["login_request"] = time.perf_counter() - start
+    assert resp.status_code == 302, resp.status_code
+
+    start = time.perf_counter()
+    resp = idp_session.get(resp.headers["Location"], allow_redirects=False)
+    timings["authorize"] = time.perf_counter() - start
+    assert resp.status_code == 302, resp.status_code
+
+    callback = urlsplit(resp.headers["Location"])
+    start = time.perf_counter()
+    resp = client.get(f"{callback.path}?{callback.query}")
+    timings["callback"] = time.perf_counter() - start
+    assert resp.status_code == 302, resp.get_data(as_text=True)
+    timings["after_logged_in"] = oidc.timings.after_logged_in
+
+    with client.session_transaction() as session:
+        assert "user" in session
+    return timings
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def run(logins: int = 100, concurrency: int = 8) -> dict:
+    """Run the benchmark and return the throughput and step latencies.
+
+    :param logins: Total number of logins
+    :param concurrency: Number of concurrent logins
+    :return: dict with `logins`, `logins_per_sec`, `pool` (connection pool
+        stats) and the p50/p95/max latency (in ms) of each step
+    """
+    provider = FakeOIDCProvider().start()
+    try:
+        app = Dash(__name__)
+        app.layout = html.Div("Hello")
+        oidc = _TimedOIDCAuth(
+            app, secret_key="benchmark", http_pool_maxsize=concurrency
+        )
+        provider.register(oidc)
+        idp_session = requests.Session()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(
+                lambda _: _login(oidc, idp_session), range(logins)
+            ))
+        elapsed = time.perf_counter() - start
+
+        steps = defaultdict(list)
+        for result in results:
+            for step, duration in result.items():
+                steps[step].append(duration * 1000)
+        report = {
+            "logins": logins,
+            "concurrency": concurrency,
+            "logins_per_sec": logins / elapsed,
+            "pool": oidc.pool_stats()["idp"],
+        }
+        for step in STEPS:
+            report[step] = {
+                "p50": statistics.median(steps[step]),
+                "p95": _percentile(steps[step], 0.95),
+                "max": max(steps[step]),
+            }
+        return report
+    finally:
+        provider.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    report = run(args.logins, args.concurrency)
+    print(
+        f"{report['logins']} logins, concurrency {report['concurrency']}: "
+        f"{report['logins_per_sec']:.1f} logins/sec"
+    )
+    print(f"{'step':<16}{'p50 (ms)':>10}{'p95 (ms)':>10}{'max (ms)':>10}")
+    for step in STEPS:
+        latency = report[step]
+        print(
+            f"{step:<16}{latency['p50']:>10.2f}"
+            f"{latency['p95']:>10.2f}{latency['max']:>10.2f}"
+        )
+    print(f"provider connection pool: {report['pool']}")
+
+
+if __name__ == "__main__":
+    main()
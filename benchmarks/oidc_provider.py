@@ -0,0 +1,243 @@
+"""In-process OpenID Connect provider stand-in for tests and benchmarks.
+
+It serves a discovery document, a JWKS, auto-approving authorize,
+token and userinfo endpoints issuing real RS256-signed ID tokens,
+and a token introspection endpoint, so that the discovery, token exchange
+and ID token validation paths of OIDCAuth run unpatched.
+"""
+import base64
+import json
+import secrets
+import threading
+import time
+from urllib.parse import urlencode
+
+from joserfc import jwt
+from joserfc.jwk import RSAKey
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.utils import redirect
+from werkzeug.wrappers import Request, Response
+
+
+class _KeepAliveHandler(WSGIRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class FakeOIDCProvider:
+    def __init__(
+        self,
+        users: dict = None,
+        client_id: str = "test-client",
+        client_secret: str = "test-secret",
+        token_lifetime: int = 3600,
+    ):
+        """
+        :param users: claims of the users the provider knows, by subject.
+            The authorize endpoint logs in the user given by the `login_hint`
+            parameter, or the first user.
+        :param client_id: Client ID of the only registered client
+        :param client_secret: Client secret of the only registered client
+        :param token_lifetime: Lifetime of the issued tokens in seconds
+        """
+        self.users = users or {
+            "a.b": {"email": "a.b@mail.com", "groups": ["viewer", "editor"]},
+        }
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_lifetime = token_lifetime
+        self.key = RSAKey.generate_key(2048, parameters={"kid": "test-key"})
+        self.calls = {}
+        # Artificial latency of the introspection endpoint, in seconds
+        self.introspection_delay = 0
+        self._codes = {}
+        self._access_tokens = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self.url = None
+
+    def start(self):
+        self._server = make_server(
+            "127.0.0.1", 0, self.wsgi_app, threaded=True,
+            request_handler=_KeepAliveHandler,
+        )
+        self.url = f"http://127.0.0.1:{self._server.port}"
+        threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def metadata_url(self):
+        return f"{self.url}/.well-known/openid-configuration"
+
+    def register(self, oidc, idp: str = "idp", **kwargs):
+        """Register the provider on an OIDCAuth instance."""
+        oidc.register_provider(
+            idp,
+            token_endpoint_auth_method="client_secret_post",
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+            server_metadata_url=self.metadata_url,
+            **kwargs,
+        )
+
+    def issue_access_token(
+        self, sub: str, lifetime: int = None, client_id: str = None
+    ) -> str:
+        """Issue an opaque access token for a user, by default to the
+        registered client."""
+        token = secrets.token_urlsafe(24)
+        exp = int(time.time()) + (lifetime or self.token_lifetime)
+        with self._lock:
+            self._access_tokens[token] = (
+                sub, exp, client_id or self.client_id
+            )
+        return token
+
+    def revoke_access_token(self, token: str):
+        with self._lock:
+            self._access_tokens.pop(token, None)
+
+    def _count(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+    @Request.application
+    def wsgi_app(self, request: Request):
+        endpoint = {
+            "/.well-known/openid-configuration": self._discovery,
+            "/jwks": self._jwks,
+            "/authorize": self._authorize,
+            "/token": self._token,
+            "/userinfo": self._userinfo,
+            "/introspect": self._introspect,
+        }.get(request.path)
+        if endpoint is None:
+            return Response("Not Found", status=404)
+        self._count(request.path)
+        return endpoint(request)
+
+    @staticmethod
+    def _json(data, status=200):
+        return Response(
+            json.dumps(data), status=status, mimetype="application/json"
+        )
+
+    def _discovery(self, request):
+        return self._json({
+            "issuer": self.url,
+            "authorization_endpoint": f"{self.url}/authorize",
+            "token_endpoint": f"{self.url}/token",
+            "userinfo_endpoint": f"{self.url}/userinfo",
+            "jwks_uri": f"{self.url}/jwks",
+            "introspection_endpoint": f"{self.url}/introspect",
+            "response_types_supported": ["code"],
+            "subject_types_supported": ["public"],
+            "id_token_signing_alg_values_supported": ["RS256"],
+            "token_endpoint_auth_methods_supported": [
+                "client_secret_post", "client_secret_basic"
+            ],
+        })
+
+    def _jwks(self, request):
+        return self._json({"keys": [self.key.as_dict(private=False)]})
+
+    def _authorize(self, request):
+        args = request.args
+        if args.get("client_id") != self.client_id:
+            return Response("Unknown client", status=400)
+        sub = args.get("login_hint") or next(iter(self.users))
+        if sub not in self.users:
+            query = urlencode({
+                "error": "access_denied",
+                "error_description": "unknown user",
+                "state": args.get("state", ""),
+            })
+            return redirect(f"{args['redirect_uri']}?{query}")
+        code = secrets.token_urlsafe(16)
+        with self._lock:
+            self._codes[code] = {
+                "sub": sub,
+                "nonce": args.get("nonce"),
+                "redirect_uri": args.get("redirect_uri"),
+            }
+        query = urlencode({"code": code, "state": args.get("state", "")})
+        return redirect(f"{args['redirect_uri']}?{query}")
+
+    def _client_credentials(self, request):
+        header = request.headers.get("Authorization", "")
+        if header.startswith("Basic "):
+            decoded = base64.b64decode(header[6:]).decode()
+            return tuple(decoded.split(":", 1))
+        return request.form.get("client_id"), request.form.get("client_secret")
+
+    def _token(self, request):
+        if self._client_credentials(request) != (
+            self.client_id, self.client_secret
+        ):
+            return self._json({"error": "invalid_client"}, 401)
+        with self._lock:
+            grant = self._codes.pop(request.form.get("code"), None)
+        if (
+            grant is None
+            or grant["redirect_uri"] != request.form.get("redirect_uri")
+        ):
+            return self._json({"error": "invalid_grant"}, 400)
+
+        now = int(time.time())
+        claims = {
+            "iss": self.url,
+            "sub": grant["sub"],
+            "aud": self.client_id,
+            "iat": now,
+            "exp": now + self.token_lifetime,
+            **self.users[grant["sub"]],
+        }
+        if grant["nonce"]:
+            claims["nonce"] = grant["nonce"]
+        id_token = jwt.encode(
+            {"alg": "RS256", "kid": self.key.kid}, claims, self.key
+        )
+        return self._json({
+            "access_token": self.issue_access_token(grant["sub"]),
+            "token_type": "Bearer",
+            "expires_in": self.token_lifetime,
+            "refresh_token": secrets.token_urlsafe(24),
+            "id_token": id_token,
+        })
+
+    def _userinfo(self, request):
+        token = request.headers.get("Authorization", "")[len("Bearer "):]
+        with self._lock:
+            sub, exp = self._access_tokens.get(token, (None, 0))
+        if sub is None or exp < time.time():
+            return self._json({"error": "invalid_token"}, 401)
+        return self._json({"sub": sub, **self.users[sub]})
+
+    def _introspect(self, request):
+        if self._client_credentials(request) != (
+            self.client_id, self.client_secret
+        ):
+            return self._json({"error": "invalid_client"}, 401)
+        time.sleep(self.introspection_delay)
+        with self._lock:
+            sub, exp, client_id = self._access_tokens.get(
+                request.form.get("token"), (None, 0, None)
+            )
+        if sub is None or exp < time.time():
+            return self._json({"active": False})
+        return self._json({
+            "active": True,
+            "sub": sub,
+            "client_id": client_id,
+            "token_type": "Bearer",
+            "exp": exp,
+            **self.users[sub],
+        })
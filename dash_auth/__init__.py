@@ -1,7 +1,20 @@
 from .public_routes import add_public_routes, public_callback
+from .api_key_auth import APIKeyAuth, hash_api_key
+from .audit import AuditLog, JSONLAuditSink, SQLiteAuditSink
 from .basic_auth import BasicAuth
+from .chain_auth import ChainAuth
+from .circuit_breaker import CircuitBreaker
+from .group_provider import BulkGroupProvider, GroupIndex
+from .htpasswd import HtpasswdFile
+from .idp_discovery import IdPDiscovery
+from .layout_cache import LayoutCache
+from .middleware import AuthMiddleware
+from .profiling import AuthProfiler
+from .proxy_header_auth import ProxyHeaderAuth
+from .rate_limit import SQLiteTokenBucketLimiter, TokenBucketLimiter
+from .shared_cache import SharedMemoryCache
 from .group_protection import (
-    list_groups, check_groups, protected, protected_callback
+    get_user, list_groups, check_groups, protected, protected_callback
 )
 # oidc auth requires authlib, install with `pip install dash-auth[oidc]`
 try:
@@ -13,13 +26,32 @@ from .version import __version__
 
 __all__ = [
     "add_public_routes",
+    "APIKeyAuth",
+    "AuditLog",
+    "AuthProfiler",
+    "AuthMiddleware",
     "check_groups",
+    "get_user",
     "list_groups",
     "get_oauth",
+    "hash_api_key",
     "protected",
     "protected_callback",
     "public_callback",
     "BasicAuth",
+    "BulkGroupProvider",
+    "ChainAuth",
+    "JSONLAuditSink",
+    "SQLiteAuditSink",
+    "CircuitBreaker",
+    "ProxyHeaderAuth",
+    "GroupIndex",
+    "HtpasswdFile",
+    "IdPDiscovery",
+    "LayoutCache",
+    "SharedMemoryCache",
+    "SQLiteTokenBucketLimiter",
+    "TokenBucketLimiter",
     "OIDCAuth",
     "__version__",
 ]
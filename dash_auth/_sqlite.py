@@ -0,0 +1,34 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteConnections:
+    """Connections to a SQLite database file, one per thread and process.
+
+    SQLite connections must not be used across a fork (e.g. by the workers
+    of a gunicorn app created with --preload), so a forked process opens
+    its own connections when called.
+    """
+
+    def __init__(self, path: str, timeout: float = 10):
+        """
+        :param path: Path of the SQLite database file
+        :param timeout: Time in seconds to wait for a lock on the database
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        # Connections inherited from a parent process are kept open, since
+        # closing them would also use them
+        self._inherited = []
+
+    def __call__(self) -> sqlite3.Connection:
+        """Connection of the current thread and process."""
+        pid, conn = getattr(self._local, "conn", (None, None))
+        if pid != os.getpid():
+            if conn is not None:
+                self._inherited.append(conn)
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            self._local.conn = os.getpid(), conn
+        return conn
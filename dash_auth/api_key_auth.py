@@ -0,0 +1,170 @@
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+import flask
+from dash import Dash
+
+from .auth import Auth
+from .group_protection import REQUEST_USER
+from .htpasswd import file_signature
+
+# Key digest, name and groups
+KeyEntry = Tuple[bytes, str, List[str]]
+# Length of the digest prefix indexing the keys, the full digests are
+# then compared in constant time
+INDEX_PREFIX_SIZE = 8
+
+
+def hash_api_key(api_key: str) -> str:
+    """SHA-256 hex digest of an API key, as expected by `APIKeyAuth`."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class APIKeyAuth(Auth):
+    def __init__(
+        self,
+        app: Dash,
+        api_keys: Union[Dict[str, str], str],
+        key_groups: Optional[Dict[str, List[str]]] = None,
+        header: str = "X-API-Key",
+        public_routes: Optional[list] = None,
+        check_interval: float = 5,
+    ):
+        """Add API key authentication to Dash, e.g. for machine-to-machine
+        calls to the callbacks.
+
+        Keys are sent in a request header, and only their SHA-256 digest
+        is stored. Nothing is read from or written to the session: the
+        key's name and groups are available for the current request only,
+        with `get_user`, `list_groups` and `check_groups`.
+
+        :param app: Dash app
+        :param api_keys: dict of key names to the SHA-256 hex digest of the
+            keys (see `hash_api_key`), or path of a file with a
+            `name:sha256_hex_digest[:group1,group2]` line per key,
+            reloaded when it changes
+        :param key_groups: dict of key names to groups, when `api_keys`
+            is a dict
+        :param header: name of the request header holding the key
+        :param public_routes: list of public routes, routes should follow the
+            Flask route syntax
+        :param check_interval: minimum interval in seconds between checks
+            for changes of the keys file. If the file is deleted or cannot
+            be parsed, the last keys are kept.
+        :raises ValueError: if the keys file does not exist or cannot be
+            parsed
+        """
+        super().__init__(app, public_routes=public_routes)
+        self.header = header
+        self._environ_key = "HTTP_" + header.upper().replace("-", "_")
+        self.check_interval = check_interval
+        self._path = None
+        self._signature = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+        if isinstance(api_keys, str):
+            if key_groups is not None:
+                raise ValueError(
+                    "APIKeyAuth reads the key groups from the keys file, "
+                    "key_groups cannot be used with a file."
+                )
+            if file_signature(api_keys) is None:
+                raise ValueError(f"APIKeyAuth keys file not found: {api_keys}")
+            self._path = api_keys
+            self.reload()
+        else:
+            key_groups = key_groups or {}
+            self._keys = self._index(
+                (name, digest, key_groups.get(name, []))
+                for name, digest in api_keys.items()
+            )
+
+    @staticmethod
+    def _index(entries) -> Dict[bytes, KeyEntry]:
+        """Index the keys by digest prefix."""
+        keys = {}
+        for name, digest, groups in entries:
+            digest = bytes.fromhex(digest)
+            keys[digest[:INDEX_PREFIX_SIZE]] = (digest, name, list(groups))
+        return keys
+
+    @staticmethod
+    def _parse(path: str):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                name, digest, groups = (line.split(":", 2) + [""])[:3]
+                yield name, digest, [
+                    group.strip() for group in groups.split(",")
+                    if group.strip()
+                ]
+
+    def reload(self, force: bool = True):
+        """Reload the keys file if it changed since it was last loaded.
+
+        :param force: Whether to wait for a reload in progress in another
+            thread, otherwise skip the reload
+        """
+        if self._path is None:
+            return
+        if not self._reload_lock.acquire(blocking=force):
+            return
+        try:
+            self._last_check = time.monotonic()
+            signature = file_signature(self._path)
+            if signature != self._signature:
+                try:
+                    if signature is None:
+                        raise FileNotFoundError(self._path)
+                    self._keys = self._index(self._parse(self._path))
+                except (OSError, ValueError) as err:
+                    # Keep the last keys, unless none were loaded yet
+                    if self._signature is None:
+                        raise
+                    logging.warning(
+                        "Could not reload the API keys file, "
+                        "keeping the last keys: %r", err
+                    )
+                else:
+                    self._signature = signature
+        finally:
+            self._reload_lock.release()
+
+    def _lookup(self, api_key: str) -> Optional[KeyEntry]:
+        if (
+            self._path is not None
+            and time.monotonic() - self._last_check >= self.check_interval
+        ):
+            self.reload(force=False)
+        digest = hashlib.sha256(api_key.encode()).digest()
+        entry = self._keys.get(digest[:INDEX_PREFIX_SIZE])
+        if entry is None or not hmac.compare_digest(entry[0], digest):
+            return None
+        return entry
+
+    def rejects_environ(self, environ: dict) -> bool:
+        return not environ.get(self._environ_key)
+
+    def is_authorized(self):
+        api_key = flask.request.headers.get(self.header)
+        if not api_key:
+            return False
+        entry = self._lookup(api_key)
+        if entry is None:
+            return False
+        _, name, groups = entry
+        setattr(flask.g, REQUEST_USER, {"email": name, "groups": groups})
+        return True
+
+    def login_request(self):
+        return flask.Response(
+            "Invalid API key",
+            headers={"WWW-Authenticate": f'APIKey header="{self.header}"'},
+            status=401,
+        )
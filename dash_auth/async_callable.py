@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import inspect
+import threading
+from typing import Any, Callable, Coroutine, Hashable, Optional
+
+from .cache import SingleFlight
+
+
+class BackgroundEventLoop:
+    """Long-lived asyncio event loop running in a daemon thread.
+
+    Coroutines submitted from any thread share the loop (and thus the
+    connections of asyncio-based clients), instead of creating a new
+    event loop per call with `asyncio.run`.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever,
+                    name="dash-auth-event-loop",
+                    daemon=True,
+                ).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and wait for its result."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self):
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+
+
+background_loop = BackgroundEventLoop()
+
+
+def is_async_callable(func: Callable) -> bool:
+    return inspect.iscoroutinefunction(func) or (
+        callable(func) and inspect.iscoroutinefunction(
+            getattr(func, "__call__", None)
+        )
+    )
+
+
+class AsyncCallable:
+    """Synchronous wrapper of a coroutine function.
+
+    Calls run on a background event loop, and concurrent calls with the
+    same arguments are coalesced into a single awaited call.
+    """
+
+    def __init__(
+        self,
+        func: Callable[..., Coroutine],
+        loop: BackgroundEventLoop = background_loop,
+        key: Optional[Callable[..., Hashable]] = None,
+    ):
+        """
+        :param func: The coroutine function
+        :param loop: The event loop running the calls
+        :param key: Function computing the key identifying identical calls
+            from the arguments, by default the arguments themselves
+        """
+        self.func = func
+        self.loop = loop
+        self.key = key or (lambda *args: args)
+        self.__name__ = getattr(func, "__name__", type(func).__name__)
+        self._calls = SingleFlight()
+
+    def __call__(self, *args) -> Any:
+        return self._calls.do(
+            self.key(*args), lambda: self.loop.run(self.func(*args))
+        )
+
+
+def credentials_key(username: str, password: str) -> Hashable:
+    """Key identifying credentials without keeping the password."""
+    return username, hashlib.sha256(password.encode()).digest()
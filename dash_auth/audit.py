@@ -0,0 +1,240 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from dash import Dash
+from flask import current_app, has_app_context, has_request_context, request
+
+# Key of the Flask config holding the app's audit log
+AUDIT_LOG = "DASH_AUTH_AUDIT_LOG"
+DropPolicy = Literal["drop_new", "drop_oldest", "block"]
+
+
+class JSONLAuditSink:
+    """Append audit events to a JSON Lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, events: List[Dict[str, Any]]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(event) + "\n" for event in events)
+
+    def close(self):
+        pass
+
+
+class SQLiteAuditSink:
+    """Insert audit events into a SQLite database."""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Only used by the audit log's writer thread
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS audit_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "ts REAL NOT NULL, "
+                "event TEXT NOT NULL, "
+                "data TEXT NOT NULL)"
+            )
+
+    def write(self, events: List[Dict[str, Any]]):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO audit_events (ts, event, data) VALUES (?, ?, ?)",
+                [
+                    (event["ts"], event["event"], json.dumps(event))
+                    for event in events
+                ],
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+class AuditLog:
+    """Structured audit events, written in batches by a background thread.
+
+    Events are put in a bounded in-memory queue, so that recording them
+    does not add I/O to the requests. When the queue is full, events are
+    dropped according to the `policy` and counted in `stats`.
+
+    Usage:
+    >>> AuditLog("audit.jsonl").init_app(app)
+
+    dash-auth then records sign-ins, denied requests and denied callbacks.
+    """
+
+    def __init__(
+        self,
+        sink: Union[str, JSONLAuditSink, SQLiteAuditSink],
+        max_queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1,
+        policy: DropPolicy = "drop_new",
+        block_timeout: float = 0.1,
+    ):
+        """
+        :param sink: Path of a JSON Lines file, or an object with
+            `write(events)` and `close()` methods, e.g. `SQLiteAuditSink`
+        :param max_queue_size: Maximum number of events waiting to be
+            written
+        :param batch_size: Maximum number of events written at once
+        :param flush_interval: Maximum time in seconds an event waits for
+            a batch to fill up
+        :param policy: What to do when the queue is full:
+            "drop_new" drops the new event, "drop_oldest" drops the oldest
+            queued event, "block" waits up to `block_timeout` seconds for
+            room in the queue, then drops the new event
+        :param block_timeout: Maximum wait of the "block" policy in seconds
+        """
+        if policy not in ("drop_new", "drop_oldest", "block"):
+            raise ValueError(f"Unknown audit log drop policy: {policy}")
+        self.sink = JSONLAuditSink(sink) if isinstance(sink, str) else sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(max_queue_size)
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        self._stats = {
+            "emitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "errors": 0,
+        }
+
+    def init_app(self, app: Dash) -> "AuditLog":
+        """Record the auth events of a Dash app in this audit log."""
+        app.server.config[AUDIT_LOG] = self
+        return self
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop,
+                    name="dash-auth-audit",
+                    daemon=True,
+                )
+                self._writer.start()
+
+    def emit(self, event: str, **fields):
+        """Queue an event, without blocking unless the policy is "block".
+
+        :param event: Event type, e.g. "signin"
+        :param fields: Event data, which must be JSON serializable
+        """
+        if self._closed:
+            return
+        if self._writer is None:
+            self._start_writer()
+        record = {"ts": time.time(), "event": event, **fields}
+        self._count("emitted")
+        try:
+            if self.policy == "block":
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+            return
+        except queue.Full:
+            if self.policy != "drop_oldest":
+                self._count("dropped")
+                return
+        # Make room for the new event, another thread may race for it
+        try:
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self._count("dropped")
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._count("dropped")
+
+    def _write_loop(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                if self._closed:
+                    return
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(
+                        timeout=max(0, deadline - time.monotonic())
+                    ))
+                except queue.Empty:
+                    break
+            try:
+                self.sink.write(batch)
+                self._count("written", len(batch))
+                self._count("batches")
+            except Exception:
+                logging.exception(
+                    "Could not write %d audit events.", len(batch)
+                )
+                self._count("errors")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = 5) -> bool:
+        """Wait until the queued events are written.
+
+        :return: Whether all the events were written within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout: float = 5):
+        """Write the queued events and stop the writer thread."""
+        self.flush(timeout)
+        self._closed = True
+        if self._writer is not None:
+            self._writer.join(self.flush_interval + timeout)
+        self.sink.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Counters of emitted, written and dropped events, of written
+        batches and of write errors, and the current queue size."""
+        with self._lock:
+            return {**self._stats, "queued": self._queue.qsize()}
+
+
+def audit_event(event: str, **fields):
+    """Record an event in the audit log of the current app, if any.
+
+    The client IP and path of the current request are added to the event.
+    """
+    if not has_app_context():
+        return
+    audit_log = current_app.config.get(AUDIT_LOG)
+    if audit_log is None:
+        return
+    if has_request_context():
+        fields = {
+            "ip": request.remote_addr, "path": request.path, **fields
+        }
+    audit_log.emit(event, **fields)
@@ -3,11 +3,17 @@ from abc import ABC, abstractmethod
 from typing import Optional
 
 from dash import Dash
-from flask import request
+from flask import Response, request
 
-from .public_routes import (
-    add_public_routes, get_public_callbacks, get_public_routes
-)
+from .audit import audit_event
+from .callback_index import UNKNOWN, RoutingCallbackIndex
+from .pages import PageGroupIndex
+from .public_routes import add_public_routes, get_public_registry
+
+CALLBACK_ROUTE = "/_dash-update-component"
+# WSGI environ keys set by `AuthMiddleware`
+PUBLIC_ENVIRON_KEY = "dash_auth.public"
+CREDENTIAL_CACHE_ENVIRON_KEY = "dash_auth.credential_cache"
 
 
 class Auth(ABC):
@@ -31,6 +37,8 @@ class Auth(ABC):
             )
 
         self.app = app
+        self.page_groups = PageGroupIndex(app)
+        self.routing_callbacks = RoutingCallbackIndex(app)
         self._protect()
         if public_routes is not None:
             add_public_routes(app, public_routes)
@@ -40,7 +48,9 @@ class Auth(ABC):
 
         The authentication check will pass if either
             * The endpoint is marked as public via `add_public_routes`
-            * The request is authorised by `Auth.is_authorised`
+            * The request is authorised by `Auth.is_authorised`, and the
+              user has the groups required by the requested Dash page, if
+              any (see `PageGroupIndex`)
         """
 
         server = self.app.server
@@ -48,13 +58,23 @@ class Auth(ABC):
         @server.before_request
         def before_request_auth():
 
-            public_routes = get_public_routes(self.app)
-            public_callbacks = get_public_callbacks(self.app)
+            # The path was already matched against the public routes
+            # if the request went through `AuthMiddleware`
+            is_public_path = request.environ.get(PUBLIC_ENVIRON_KEY)
+            if is_public_path:
+                return None
+
+            # A consistent snapshot, even if routes are added concurrently
+            public = get_public_registry(self.app).snapshot
+            public_routes = public.routes
+            public_callbacks = public.callbacks
+            # Path of the requested page, for page loads and routing callbacks
+            page_path = request.path
             # Handle Dash's callback route:
             # * Check whether the callback is marked as public
             # * Check whether the callback is performed on route change in
             #   which case the path should be checked against the public routes
-            if request.path == "/_dash-update-component":
+            if request.path == CALLBACK_ROUTE:
                 body = request.get_json()
 
                 # Check whether the callback is marked as public
@@ -63,30 +83,71 @@ class Auth(ABC):
 
                 # Check whether the callback has an input using the pathname,
                 # such a callback will be a routing callback and the pathname
-                # should be checked against the public routes
-                pathname = next(
-                    (
-                        inp.get("value") for inp in body["inputs"]
-                        if isinstance(inp, dict)
-                        and inp.get("property") == "pathname"
-                    ),
-                    None,
+                # should be checked against the public routes.
+                # The input position is known in advance for the registered
+                # callbacks, the inputs are only scanned for unknown ones.
+                pathname = None
+                position = self.routing_callbacks.pathname_position(
+                    body["output"]
                 )
+                if position == UNKNOWN:
+                    pathname = next(
+                        (
+                            inp.get("value") for inp in body["inputs"]
+                            if isinstance(inp, dict)
+                            and inp.get("property") == "pathname"
+                        ),
+                        None,
+                    )
+                elif position is not None and position < len(body["inputs"]):
+                    inp = body["inputs"][position]
+                    if (
+                        isinstance(inp, dict)
+                        and inp.get("property") == "pathname"
+                    ):
+                        pathname = inp.get("value")
                 if pathname and public_routes.test(pathname):
                     return None
+                page_path = pathname
 
             # If the route is not a callback route, check whether the path
             # matches a public route, or whether the request is authorised
-            if public_routes.test(request.path) or self.is_authorized():
+            if is_public_path is None and public_routes.test(request.path):
+                return None
+            if self.is_authorized():
+                if page_path and not self.page_groups.allows(page_path):
+                    audit_event("page_denied", page=page_path)
+                    return Response("Forbidden", status=403)
                 return None
 
             # Otherwise, ask the user to log in
+            audit_event("denied", auth=type(self).__name__)
             return self.login_request()
 
+        self._before_request_auth = before_request_auth
+
+    def _unprotect(self):
+        """Remove the before_request authentication check, e.g. when the
+        check is done by a `ChainAuth` instead."""
+        hooks = self.app.server.before_request_funcs.get(None, [])
+        if self._before_request_auth in hooks:
+            hooks.remove(self._before_request_auth)
+
     @abstractmethod
     def is_authorized(self):
         pass
 
+    def rejects_environ(self, environ: dict) -> bool:
+        """Whether a request to a protected route can be rejected from its
+        WSGI environ alone, before Flask dispatches it.
+
+        This is used by `AuthMiddleware`, which then returns
+        `login_request()` without a request context.
+
+        :param environ: WSGI environ of the request
+        """
+        return False
+
     @abstractmethod
     def login_request(self):
         pass
@@ -1,12 +1,27 @@
 import base64
+import hashlib
 import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Union, Callable
 import flask
 from dash import Dash
 
-from .auth import Auth
+from .audit import audit_event
+from .async_callable import AsyncCallable, credentials_key, is_async_callable
+from .auth import Auth, CREDENTIAL_CACHE_ENVIRON_KEY
+from .cache import TTLCache
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, GuardedCallable
+from .group_provider import GroupIndex
+from .rate_limit import TokenBucketLimiter
+from .shared_cache import SharedMemoryCache
 
 UserGroups = Dict[str, List[str]]
+# Attribute of flask.g set when a request is rate limited
+RETRY_AFTER = "dash_auth_retry_after"
+# Sign-ins without a session are logged once per user and worker per TTL
+SESSIONLESS_SIGNIN_CACHE_SIZE = 10000
+SESSIONLESS_SIGNIN_TTL = 3600
 
 
 class BasicAuth(Auth):
@@ -19,7 +34,14 @@ class BasicAuth(Auth):
         user_groups: Optional[
             Union[UserGroups, Callable[[str], UserGroups]]
         ] = None,
-        secret_key: str = None
+        secret_key: str = None,
+        rate_limiter: Optional[TokenBucketLimiter] = None,
+        rate_limit_status: int = 429,
+        callback_timeout: Optional[float] = None,
+        callback_pool_size: int = 8,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        stale_result_ttl: float = 300,
+        shared_cache: Optional[SharedMemoryCache] = None,
     ):
         """Add basic authentication to Dash.
 
@@ -29,11 +51,17 @@ class BasicAuth(Auth):
         :param auth_func: python function accepting two string
             arguments (username, password) and returning a
             boolean (True if the user has access otherwise False).
+            It can be a coroutine function, in which case it runs on a
+            background event loop and concurrent calls with the same
+            credentials are coalesced.
         :param public_routes: list of public routes, routes should follow the
             Flask route syntax
         :param user_groups: a dict or a function returning a dict
             Optional group for each user, allowing to protect routes and
-            callbacks depending on user groups
+            callbacks depending on user groups.
+            The function can be a coroutine function, like `auth_func`.
+            It can also be a `GroupIndex`, pre-loading the groups of all
+            the users from a bulk provider.
         :param secret_key: Flask secret key
             A string to protect the Flask session, by default None.
             It is required if you need to store the current user
@@ -46,12 +74,66 @@ class BasicAuth(Auth):
             Note that you should not do this dynamically:
             you should create a key and then assign the value of
             that key in your code.
+        :param rate_limiter: a token bucket rate limiter, limiting the
+            failed login attempts per client IP and per username.
+            Requests exceeding the limit are rejected before the credentials
+            are checked. Use `SQLiteTokenBucketLimiter` to share the limits
+            between workers.
+        :param rate_limit_status: HTTP status of rate limited requests,
+            429 (Too Many Requests) or 401 (login request)
+        :param callback_timeout: timeout in seconds of the calls to
+            `auth_func` and `user_groups` (if it is a function).
+            When set, or when a `circuit_breaker` is passed, these functions
+            run on a bounded thread pool (outside of the request context),
+            so that a slow backend cannot block the server's threads.
+        :param callback_pool_size: size of the thread pool running
+            `auth_func` and `user_groups`
+        :param circuit_breaker: circuit breaker of the backend used by
+            `auth_func` and `user_groups`, by default one opening after
+            5 consecutive failures or timeouts. Its `on_state_change`
+            callback can be used to emit metrics on trips and recoveries.
+        :param stale_result_ttl: time in seconds the last result of
+            `auth_func` and `user_groups` for given arguments is kept to be
+            used while the backend fails or the circuit is open, 0 to
+            fail fast instead
+        :param shared_cache: cache shared between the worker processes of
+            the host, caching the successful `auth_func` verifications and
+            the `user_groups` function results for its TTL, so that each
+            user is checked against the backend once per host rather than
+            once per worker. Its keys are hashed with the Flask secret key
+            unless the cache has its own `hash_key`.
         """
         super().__init__(app, public_routes=public_routes)
         self._auth_func = auth_func
+        self._shared_cache = shared_cache
         self._user_groups = user_groups
+        self._rate_limiter = rate_limiter
+        self._rate_limit_status = rate_limit_status
+        self._sessionless_signins = TTLCache(
+            maxsize=SESSIONLESS_SIGNIN_CACHE_SIZE, ttl=SESSIONLESS_SIGNIN_TTL
+        )
+        if is_async_callable(self._auth_func):
+            self._auth_func = AsyncCallable(
+                self._auth_func, key=credentials_key
+            )
+        if is_async_callable(self._user_groups):
+            self._user_groups = AsyncCallable(self._user_groups)
+        if callback_timeout is not None or circuit_breaker is not None:
+            self._guard_callbacks(
+                callback_timeout,
+                callback_pool_size,
+                circuit_breaker or CircuitBreaker("BasicAuth backend"),
+                stale_result_ttl,
+            )
         if secret_key is not None:
             app.server.secret_key = secret_key
+        if shared_cache is not None and not shared_cache.has_hash_key:
+            if not app.server.secret_key:
+                raise ValueError(
+                    "BasicAuth requires a secret key to use a shared cache "
+                    "without a hash key."
+                )
+            shared_cache.set_hash_key(app.server.secret_key)
 
         if self._auth_func is not None:
             if username_password_list is not None:
@@ -73,40 +155,176 @@ class BasicAuth(Auth):
                     else {k: v for k, v in username_password_list}
                 )
 
+    def _guard_callbacks(
+        self,
+        timeout: Optional[float],
+        pool_size: int,
+        breaker: CircuitBreaker,
+        stale_result_ttl: float,
+    ):
+        """Run auth_func and user_groups through `GuardedCallable`."""
+        self.circuit_breaker = breaker
+        executor = ThreadPoolExecutor(
+            pool_size, thread_name_prefix="dash-auth-callbacks"
+        )
+
+        def guard(func, key):
+            return GuardedCallable(
+                func,
+                executor,
+                max_pending=2 * pool_size,
+                timeout=timeout,
+                breaker=breaker,
+                fallback=TTLCache(ttl=stale_result_ttl)
+                if stale_result_ttl else None,
+                key=key,
+            )
+
+        if self._auth_func is not None:
+            self._auth_func = guard(self._auth_func, credentials_key)
+        if callable(self._user_groups) and not isinstance(
+            self._user_groups, GroupIndex
+        ):
+            self._user_groups = guard(
+                self._user_groups, lambda username: username
+            )
+
+    def _credential_cache_key(self, header: str):
+        return id(self), hashlib.sha256(header.encode()).digest()
+
+    def rejects_environ(self, environ: dict) -> bool:
+        header = environ.get("HTTP_AUTHORIZATION")
+        if not header or not header.startswith("Basic "):
+            return True
+        cache = environ.get(CREDENTIAL_CACHE_ENVIRON_KEY)
+        return (
+            cache is not None
+            and cache.get(self._credential_cache_key(header)) is False
+        )
+
     def is_authorized(self):
         header = flask.request.headers.get('Authorization', None)
-        if not header:
+        if not header or not header.startswith('Basic '):
             return False
         username_password = base64.b64decode(header.split('Basic ')[1])
         username_password_utf8 = username_password.decode('utf-8')
         username, password = username_password_utf8.split(':', 1)
-        authorized = False
-        if self._auth_func is not None:
-            try:
-                authorized = self._auth_func(username, password)
-            except Exception:
-                logging.exception("Error in authorization function.")
-                return False
-        else:
-            authorized = self._users.get(username) == password
-        if authorized:
-            try:
-                flask.session["user"] = {"email": username, "groups": []}
-                if callable(self._user_groups):
-                    flask.session["user"]["groups"] = self._user_groups(
-                        username
+        rate_limit_keys = (
+            f"ip:{flask.request.remote_addr}", f"user:{username}"
+        )
+        # Attempts are started before the credentials are checked, so that
+        # concurrent attempts cannot all be checked before the limit applies
+        started = []
+        if self._rate_limiter is not None:
+            for key in rate_limit_keys:
+                retry_after = self._rate_limiter.acquire(key)
+                if retry_after:
+                    for started_key in started:
+                        self._rate_limiter.release(started_key)
+                    logging.info(
+                        "Rate limited login attempt for %s.", username
                     )
-                elif self._user_groups:
-                    flask.session["user"]["groups"] = self._user_groups.get(
-                        username, []
+                    audit_event("rate_limited", user=username)
+                    setattr(flask.g, RETRY_AFTER, retry_after)
+                    return False
+                started.append(key)
+        login_failed = False
+        try:
+            authorized = False
+            if self._auth_func is not None:
+                try:
+                    authorized = self._check_auth_func(username, password)
+                except CircuitOpenError as err:
+                    logging.warning(
+                        "Authorization function unavailable: %s", err
                     )
-            except RuntimeError:
-                logging.warning(
-                    "Session is not available. Have you set a secret key?"
-                )
+                    return False
+                except Exception:
+                    logging.exception("Error in authorization function.")
+                    return False
+            else:
+                authorized = self._users.get(username) == password
+            if authorized:
+                try:
+                    groups = self._get_user_groups(username)
+                except CircuitOpenError as err:
+                    logging.warning("User groups unavailable: %s", err)
+                    return False
+                except Exception:
+                    logging.exception("Error in user groups function.")
+                    return False
+                user = {"email": username, "groups": groups}
+                try:
+                    previous_user = flask.session.get("user")
+                    flask.session["user"] = user
+                except RuntimeError:
+                    logging.warning(
+                        "Session is not available. Have you set a secret key?"
+                    )
+                    # Browsers send the credentials with every request,
+                    # only the first one is a sign-in
+                    if username not in self._sessionless_signins:
+                        self._sessionless_signins.set(username, True)
+                        audit_event("signin", user=username)
+                else:
+                    # Only new sessions are sign-ins, not every request
+                    if previous_user != user:
+                        audit_event("signin", user=username)
+            else:
+                audit_event("login_failed", user=username)
+                login_failed = True
+                # Let `AuthMiddleware` reject these credentials early next time
+                cache = flask.request.environ.get(CREDENTIAL_CACHE_ENVIRON_KEY)
+                if cache is not None:
+                    cache.set(self._credential_cache_key(header), False)
+            return authorized
+        finally:
+            # Only failed logins take tokens
+            for key in started:
+                self._rate_limiter.release(key, failed=login_failed)
+
+    def _check_auth_func(self, username: str, password: str) -> bool:
+        cache = self._shared_cache
+        if cache is None:
+            return self._auth_func(username, password)
+        key = ("verdict", username, password)
+        if cache.get(key):
+            return True
+        authorized = self._auth_func(username, password)
+        # Only successful verifications are shared, failed attempts are
+        # left to the rate limiter
+        if authorized:
+            cache.set(key, True)
         return authorized
 
+    def _get_user_groups(self, username: str) -> List[str]:
+        if callable(self._user_groups):
+            cache = self._shared_cache
+            if cache is None or isinstance(self._user_groups, GroupIndex):
+                return self._user_groups(username)
+            key = ("groups", username)
+            groups = cache.get(key)
+            if groups is None:
+                groups = self._user_groups(username)
+                cache.set(key, groups)
+            return groups
+        if self._user_groups:
+            return self._user_groups.get(username, [])
+        return []
+
     def login_request(self):
+        if (
+            self._rate_limit_status == 429
+            and flask.has_app_context()
+            and flask.g.get(RETRY_AFTER)
+        ):
+            return flask.Response(
+                'Too Many Requests',
+                headers={
+                    'Retry-After': str(math.ceil(flask.g.get(RETRY_AFTER)))
+                },
+                status=429,
+            )
         return flask.Response(
             'Login Required',
             headers={'WWW-Authenticate': 'Basic realm="User Visible Realm"'},
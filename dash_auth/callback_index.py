@@ -0,0 +1,49 @@
+from typing import Dict, Optional, Tuple
+
+from dash import Dash
+from dash._callback import GLOBAL_CALLBACK_MAP
+
+# Returned for callbacks missing from the index
+UNKNOWN = -1
+
+
+class RoutingCallbackIndex:
+    """Index of the position of the `pathname` input of each callback.
+
+    Routing callbacks take a `pathname` input, whose value must be checked
+    against the public routes. The index is built from the callbacks
+    registered on the app, and rebuilt only when callbacks are registered
+    since, so that the request inputs do not need to be scanned for other
+    callbacks.
+    """
+
+    def __init__(self, app: Dash):
+        self.app = app
+        # Positions by output, and number of callbacks, published together
+        self._index: Tuple[Dict[str, Optional[int]], tuple] = ({}, None)
+
+    def _version(self) -> tuple:
+        return len(self.app.callback_map), len(GLOBAL_CALLBACK_MAP)
+
+    def _compile(self, version: tuple):
+        positions = {}
+        for callbacks in (GLOBAL_CALLBACK_MAP, self.app.callback_map):
+            for output, spec in callbacks.items():
+                positions[output] = next(
+                    (
+                        i for i, inp in enumerate(spec.get("inputs", []))
+                        if isinstance(inp, dict)
+                        and inp.get("property") == "pathname"
+                    ),
+                    None,
+                )
+        return positions, version
+
+    def pathname_position(self, output: str) -> Optional[int]:
+        """Position of the `pathname` input of the callback, None if it has
+        none, `UNKNOWN` if the callback is not registered."""
+        positions, version = self._index
+        current_version = self._version()
+        if version != current_version:
+            self._index = positions, _ = self._compile(current_version)
+        return positions.get(output, UNKNOWN)
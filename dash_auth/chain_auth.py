@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import flask
+from dash import Dash
+
+from .auth import Auth
+
+# Attribute of flask.g holding the strategy which authorized the request
+REQUEST_STRATEGY = "dash_auth_strategy"
+
+
+class ChainAuth(Auth):
+    def __init__(
+        self,
+        app: Dash,
+        strategies: List[Auth],
+        public_routes: Optional[list] = None,
+        login_strategy: Optional[Auth] = None,
+    ):
+        """Combine several authentication strategies on the same app, e.g.
+        API keys for bots, OIDC sessions for browsers and Basic
+        authentication for scripts.
+
+        The strategies are tried in order, in a single before_request
+        check, until one authorizes the request. Put the cheapest and
+        most common strategies first, using `stats` to measure them.
+
+        >>> ChainAuth(app, [
+        ...     APIKeyAuth(app, api_keys=API_KEYS),
+        ...     OIDCAuth(app, secret_key=SECRET_KEY),
+        ...     BasicAuth(app, USER_PWD),
+        ... ])
+
+        :param app: Dash app
+        :param strategies: list of Auth instances protecting `app`,
+            they are tried in this order
+        :param public_routes: list of public routes, routes should follow the
+            Flask route syntax
+        :param login_strategy: the strategy asking the user to log in when
+            no strategy authorizes the request, by default the first one
+        """
+        if not strategies:
+            raise ValueError("ChainAuth requires at least one strategy.")
+        for strategy in strategies:
+            if strategy.app is not app:
+                raise ValueError(
+                    "ChainAuth strategies must protect the same app."
+                )
+            # The strategies are only checked by the chain's hook
+            strategy._unprotect()
+        super().__init__(app, public_routes=public_routes)
+        self.strategies = list(strategies)
+        self.login_strategy = login_strategy or self.strategies[0]
+        self._names = {}
+        for strategy in self.strategies:
+            name = type(strategy).__name__
+            if name in self._names.values():
+                name = f"{name}#{len(self._names)}"
+            self._names[id(strategy)] = name
+        self._lock = threading.Lock()
+        self._stats = {
+            name: {"attempts": 0, "hits": 0, "time": 0.0}
+            for name in self._names.values()
+        }
+
+    def _record(self, strategy: Auth, authorized: bool, elapsed: float):
+        with self._lock:
+            stats = self._stats[self._names[id(strategy)]]
+            stats["attempts"] += 1
+            stats["hits"] += bool(authorized)
+            stats["time"] += elapsed
+
+    def authorizing_strategy(self) -> Optional[Auth]:
+        """The strategy which authorized the current request, if any."""
+        return flask.g.get(REQUEST_STRATEGY)
+
+    def is_authorized(self):
+        if self.authorizing_strategy() is not None:
+            return True
+        for strategy in self.strategies:
+            start = time.perf_counter()
+            try:
+                authorized = strategy.is_authorized()
+            finally:
+                elapsed = time.perf_counter() - start
+            self._record(strategy, authorized, elapsed)
+            if authorized:
+                setattr(flask.g, REQUEST_STRATEGY, strategy)
+                return True
+        return False
+
+    def rejects_environ(self, environ: dict) -> bool:
+        return all(
+            strategy.rejects_environ(environ) for strategy in self.strategies
+        )
+
+    def login_request(self):
+        return self.login_strategy.login_request()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Attempts, hits, hit rate and mean latency (in seconds) of
+        each strategy, by strategy name, in the chain's order."""
+        with self._lock:
+            return {
+                name: {
+                    **stats,
+                    "hit_rate": stats["hits"] / stats["attempts"]
+                    if stats["attempts"] else 0.0,
+                    "mean_latency": stats["time"] / stats["attempts"]
+                    if stats["attempts"] else 0.0,
+                }
+                for name, stats in self._stats.items()
+            }
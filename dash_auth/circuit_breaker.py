@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .cache import TTLCache
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected by an open circuit breaker."""
+
+
+class CircuitBreaker:
+    """Circuit breaker failing fast while a backend is unhealthy.
+
+    After `failure_threshold` consecutive failures, the circuit opens and
+    calls are rejected for `recovery_timeout` seconds. A single trial call
+    is then let through (half-open state): the circuit closes if it
+    succeeds, and opens again otherwise.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str = "backend",
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30,
+        on_state_change: Optional[Callable[[str, str, str], Any]] = None,
+    ):
+        """
+        :param name: Name of the protected backend, used in logs and metrics
+        :param failure_threshold: Number of consecutive failures opening
+            the circuit
+        :param recovery_timeout: Time in seconds before a trial call is
+            let through an open circuit
+        :param on_state_change: Function called with the breaker name, the
+            previous state and the new state on each trip and recovery,
+            e.g. to emit metrics
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.on_state_change = on_state_change
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {
+            "successes": 0,
+            "failures": 0,
+            "rejected": 0,
+            "trips": 0,
+            "recoveries": 0,
+        }
+
+    def _set_state(self, state: str):
+        """Change the state, the caller must hold the lock and call
+        `_notify` with the returned transition once released."""
+        previous, self.state = self.state, state
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+            if previous != self.HALF_OPEN:
+                self._stats["trips"] += 1
+                logging.warning("Circuit breaker %s opened.", self.name)
+        elif state == self.CLOSED:
+            self._stats["recoveries"] += 1
+            logging.info("Circuit breaker %s closed.", self.name)
+        return previous, state
+
+    def _notify(self, transition):
+        if transition is not None and self.on_state_change is not None:
+            self.on_state_change(self.name, *transition)
+
+    def allow(self) -> bool:
+        """Whether a call may proceed."""
+        transition = None
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            allowed = (
+                self.state == self.OPEN
+                and time.monotonic() - self._opened_at
+                >= self.recovery_timeout
+            )
+            if allowed:
+                transition = self._set_state(self.HALF_OPEN)
+            else:
+                self._stats["rejected"] += 1
+        self._notify(transition)
+        return allowed
+
+    def record_success(self):
+        transition = None
+        with self._lock:
+            self._stats["successes"] += 1
+            self._failures = 0
+            if self.state != self.CLOSED:
+                transition = self._set_state(self.CLOSED)
+        self._notify(transition)
+
+    def record_failure(self):
+        transition = None
+        with self._lock:
+            self._stats["failures"] += 1
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED
+                and self._failures >= self.failure_threshold
+            ):
+                transition = self._set_state(self.OPEN)
+        self._notify(transition)
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state and counters of successes, failures, rejected
+        calls, trips and recoveries."""
+        with self._lock:
+            return {"state": self.state, **self._stats}
+
+
+class GuardedCallable:
+    """Wrap a user callback talking to a backend (e.g. LDAP).
+
+    The callback runs on a bounded thread pool with a timeout, behind a
+    circuit breaker. When a call fails, times out or is rejected, the last
+    result for the same key is returned if it is still cached, otherwise
+    the error is raised.
+
+    Note that the callback runs outside of the Flask request context.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        executor: Executor,
+        max_pending: int,
+        timeout: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        fallback: Optional[TTLCache] = None,
+        key: Optional[Callable[..., Hashable]] = None,
+    ):
+        """
+        :param func: The callback
+        :param executor: The thread pool running the callback
+        :param max_pending: Maximum number of running or queued calls,
+            further calls fail immediately
+        :param timeout: Timeout of a call in seconds
+        :param breaker: Circuit breaker of the backend
+        :param fallback: Cache of the last results, by key
+        :param key: Function computing the fallback key from the arguments
+        """
+        self.func = func
+        self.executor = executor
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker(getattr(func, "__name__", ""))
+        self.fallback = fallback
+        self.key = key or (lambda *args: args)
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _fallback(self, args, error: Exception):
+        if self.fallback is not None:
+            sentinel = object()
+            result = self.fallback.get(self.key(*args), sentinel)
+            if result is not sentinel:
+                logging.warning(
+                    "%s failed (%r), using its last result.",
+                    self.breaker.name, error,
+                )
+                return result
+        raise error
+
+    def __call__(self, *args):
+        if not self.breaker.allow():
+            return self._fallback(
+                args, CircuitOpenError(f"{self.breaker.name} is unavailable")
+            )
+        if not self._slots.acquire(blocking=False):
+            self.breaker.record_failure()
+            return self._fallback(
+                args, CircuitOpenError(f"{self.breaker.name} is saturated")
+            )
+        try:
+            future = self.executor.submit(self.func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            result = future.result(timeout=self.timeout)
+        except Exception as err:
+            self.breaker.record_failure()
+            return self._fallback(args, err)
+        self.breaker.record_success()
+        if self.fallback is not None:
+            self.fallback.set(self.key(*args), result)
+        return result
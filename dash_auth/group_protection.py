@@ -4,11 +4,30 @@ from typing import Any, Callable, List, Literal, Optional, Union
 
 import dash
 from dash.exceptions import PreventUpdate
-from flask import session, has_request_context
+from flask import g, session, has_request_context
+
+from .audit import audit_event
 
 
 OutputVal = Union[Callable[[], Any], Any]
 CheckType = Literal["one_of", "all_of", "none_of"]
+# Attribute of flask.g holding the user of auth methods that do not
+# store the user in the session (e.g. bearer tokens)
+REQUEST_USER = "dash_auth_user"
+
+
+def get_user() -> Optional[dict]:
+    """Get the user authenticated for the current request.
+
+    :return: None if the user is not authenticated, the user data otherwise
+        e.g. {"email": "a.b@mail.com", "groups": ["admin"]}
+    """
+    if not has_request_context():
+        return None
+    user = g.get(REQUEST_USER)
+    if user is None:
+        user = session.get("user")
+    return user
 
 
 def list_groups(
@@ -25,10 +44,11 @@ def list_groups(
         * None if the user is not authenticated
         * list[str] otherwise
     """
-    if not has_request_context() or "user" not in session:
+    user = get_user()
+    if user is None:
         return None
 
-    user_groups = session.get("user", {}).get(groups_key, [])
+    user_groups = user.get(groups_key, [])
     # Handle cases where groups are ,- or ;-separated string,
     # may depend on OIDC provider
     if isinstance(user_groups, str) and groups_str_split is not None:
@@ -177,14 +197,20 @@ def protected_callback(
                 "A user tried to run %s without being authenticated.",
                 func.__name__,
             )
+            audit_event("callback_denied", callback=func.__name__)
             raise PreventUpdate
 
         def prevent_unauthorised():
             logging.info(
                 "%s tried to run %s but did not have the right permissions.",
-                session["user"]["email"],
+                get_user()["email"],
                 func.__name__,
             )
+            audit_event(
+                "callback_denied",
+                user=get_user()["email"],
+                callback=func.__name__,
+            )
             raise PreventUpdate
 
         wrapped_func = dash.callback(*callback_args, **callback_kwargs)(
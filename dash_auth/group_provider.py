@@ -0,0 +1,174 @@
+import logging
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+UserGroups = Dict[str, List[str]]
+
+
+class BulkGroupProvider(ABC):
+    """Interface of the group backends able to return the groups of all
+    the users at once, e.g. a directory queried in bulk.
+
+    `load_all` is required. `changes_since` is optional: providers without
+    incremental updates are fully reloaded on each refresh.
+    """
+
+    @abstractmethod
+    def load_all(self) -> Tuple[UserGroups, Any]:
+        """Groups of all the users, and a sync token passed to the next
+        `changes_since` call (None if not supported)."""
+
+    def changes_since(
+        self, token: Any
+    ) -> Optional[Tuple[Dict[str, Optional[List[str]]], Any]]:
+        """Groups of the users changed since the sync token (None for
+        removed users), and the new sync token.
+
+        Return None if the provider has no incremental updates (the
+        default), or raise `LookupError` if the token is no longer valid,
+        to trigger a full reload.
+        """
+        return None
+
+
+class GroupIndex:
+    """In-memory index of the groups of all the users, loaded from a
+    `BulkGroupProvider` at startup and refreshed in the background.
+
+    Pass it as the `user_groups` of `BasicAuth`, so that the groups are
+    read from the index and never resolved on the request path. Refresh
+    failures are logged and the last index is kept.
+
+    Group names and identical group lists are shared between users, and
+    each refresh publishes a new index with a single assignment, so that
+    lookups do not take any lock.
+
+    Usage:
+    >>> groups = GroupIndex(LDAPGroupProvider(), refresh_interval=60)
+    >>> BasicAuth(app, auth_func=check_ldap, user_groups=groups)
+    """
+
+    def __init__(
+        self,
+        provider: BulkGroupProvider,
+        refresh_interval: float = 60,
+        full_reload_interval: float = 3600,
+    ):
+        """
+        :param provider: Bulk group provider
+        :param refresh_interval: Interval in seconds between two refreshes
+            with the changes since the last one, 0 to disable the
+            background refreshes
+        :param full_reload_interval: Interval in seconds between two full
+            reloads, used to catch up with changes the provider may not
+            report incrementally
+        """
+        self.provider = provider
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self._index: Dict[str, Tuple[str, ...]] = {}
+        self._token = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._pid = None
+        self._stats = {"reloads": 0, "refreshes": 0, "failures": 0}
+        self.reload()
+        self._start()
+
+    def __call__(self, username: str) -> List[str]:
+        if self._pid != os.getpid():
+            # Forked after the index was created (e.g. preloaded app)
+            self._start()
+        return list(self._index.get(username, ()))
+
+    def __contains__(self, username: str) -> bool:
+        return username in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def reload(self):
+        """Load the groups of all the users from the provider."""
+        with self._lock:
+            groups, token = self.provider.load_all()
+            self._index = self._compact(groups.items(), {})
+            self._token = token
+            self._loaded_at = time.monotonic()
+            self._stats["reloads"] += 1
+
+    def refresh(self):
+        """Apply the changes since the last refresh, or reload all the
+        groups if the provider has no incremental updates or the last full
+        reload is older than `full_reload_interval`."""
+        if (
+            self._token is None
+            or time.monotonic() - self._loaded_at >= self.full_reload_interval
+        ):
+            self.reload()
+            return
+        with self._lock:
+            try:
+                result = self.provider.changes_since(self._token)
+            except LookupError:
+                result = None
+            if result is not None:
+                changes, self._token = result
+                if changes:
+                    self._index = self._compact(
+                        changes.items(), dict(self._index)
+                    )
+                self._stats["refreshes"] += 1
+        if result is None:
+            self.reload()
+
+    @staticmethod
+    def _compact(items, index: Dict[str, Tuple[str, ...]]):
+        """Add the users' groups to the index, sharing group names and
+        group lists between users."""
+        group_lists = {groups: groups for groups in index.values()}
+        for username, groups in items:
+            if groups is None:
+                index.pop(username, None)
+                continue
+            key = tuple(sorted(sys.intern(str(group)) for group in groups))
+            index[username] = group_lists.setdefault(key, key)
+        return index
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        if self.refresh_interval:
+            threading.Thread(
+                target=self._refresh_loop,
+                name="dash-auth-groups",
+                daemon=True,
+            ).start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                self._stats["failures"] += 1
+                logging.exception("Could not refresh the user groups.")
+
+    def close(self):
+        """Stop the background refreshes."""
+        self._stop.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Number of users, distinct group lists, full reloads,
+        incremental refreshes and refresh failures."""
+        index = self._index
+        return {
+            "users": len(index),
+            "group_lists": len({id(groups) for groups in index.values()}),
+            **self._stats,
+        }
@@ -0,0 +1,214 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from werkzeug.security import check_password_hash
+
+from .cache import TTLCache
+
+# bcrypt hashes require bcrypt, install with `pip install bcrypt`
+try:
+    import bcrypt
+except ModuleNotFoundError:
+    bcrypt = None
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Inode, size and modification time of a file, None if missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def verify_password(hashed: str, password: str) -> bool:
+    """Check a password against an htpasswd hash.
+
+    Supported hashes are bcrypt (`$2y$`, requires bcrypt), SHA-1 (`{SHA}`)
+    and werkzeug's `generate_password_hash` hashes (`pbkdf2:`, `scrypt:`).
+    """
+    if hashed.startswith("{SHA}"):
+        digest = base64.b64encode(
+            hashlib.sha1(password.encode()).digest()
+        ).decode()
+        return hmac.compare_digest(hashed[5:], digest)
+    if hashed.startswith(("$2y$", "$2b$", "$2a$")):
+        if bcrypt is None:
+            raise ModuleNotFoundError(
+                "bcrypt is required for bcrypt hashes, "
+                "install it with `pip install bcrypt`"
+            )
+        return bcrypt.checkpw(password.encode(), hashed.encode())
+    if hashed.startswith(("pbkdf2:", "scrypt:")):
+        return check_password_hash(hashed, password)
+    logging.warning("Unsupported password hash format.")
+    return False
+
+
+class HtpasswdFile:
+    """Credentials and groups read from htpasswd-style files.
+
+    The users file has a `username:hash` entry per line (see
+    `verify_password` for the supported hashes), and the optional groups
+    file a `group: user1 user2` entry per line (Apache htgroup format).
+    Both files are parsed line by line into dicts, and reparsed when
+    their inode, size or modification time changes, which is checked at
+    most every `check_interval` seconds.
+
+    Usage:
+    >>> htpasswd = HtpasswdFile(".htpasswd", ".htgroups")
+    >>> BasicAuth(
+    ...     app,
+    ...     auth_func=htpasswd.check_password,
+    ...     user_groups=htpasswd.get_groups,
+    ... )
+    """
+
+    def __init__(
+        self,
+        path: str,
+        groups_path: Optional[str] = None,
+        check_interval: float = 5,
+        verified_cache_size: int = 10000,
+        verified_cache_ttl: float = 300,
+    ):
+        """
+        :param path: Path of the users (htpasswd) file
+        :param groups_path: Path of the groups (htgroup) file
+        :param check_interval: Minimum interval in seconds between checks
+            for changes of the files
+        :param verified_cache_size: Maximum number of successful password
+            verifications remembered, as password hashes are slow to check
+            on purpose and browsers send the credentials with each request
+        :param verified_cache_ttl: Time in seconds a successful password
+            verification is remembered
+        :raises ValueError: if a file does not exist
+        """
+        for file_path in (path, groups_path):
+            if file_path is not None and file_signature(file_path) is None:
+                raise ValueError(f"HtpasswdFile file not found: {file_path}")
+        self.path = path
+        self.groups_path = groups_path
+        self.check_interval = check_interval
+        self._users: Dict[str, str] = {}
+        self._groups: Dict[str, List[str]] = {}
+        self._signatures = {}
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+        self._verified = TTLCache(
+            maxsize=verified_cache_size, ttl=verified_cache_ttl
+        )
+        # Verified passwords are only kept as keyed hashes
+        self._cache_key = secrets.token_bytes(32)
+        self.reload()
+
+    @staticmethod
+    def _parse_users(path: str) -> Dict[str, str]:
+        users = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                username, sep, hashed = line.partition(":")
+                if sep:
+                    users[username] = hashed
+        return users
+
+    @staticmethod
+    def _parse_groups(path: str) -> Dict[str, List[str]]:
+        groups = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.lstrip().startswith("#"):
+                    continue
+                group, sep, members = line.partition(":")
+                if not sep:
+                    continue
+                group = group.strip()
+                for username in members.split():
+                    groups.setdefault(username, []).append(group)
+        return groups
+
+    def reload(self, force: bool = True):
+        """Reparse the files which changed since they were last parsed.
+
+        :param force: Whether to wait for a reload in progress in another
+            thread, otherwise skip the reload
+        """
+        if not self._reload_lock.acquire(blocking=force):
+            return
+        try:
+            self._last_check = time.monotonic()
+            # Swap the whole dicts so readers never see a partial parse
+            users = self._reparse(self.path, self._parse_users)
+            if users is not None:
+                self._users = users
+            if self.groups_path is not None:
+                groups = self._reparse(self.groups_path, self._parse_groups)
+                if groups is not None:
+                    self._groups = groups
+        finally:
+            self._reload_lock.release()
+
+    def _reparse(self, path: str, parse: Callable[[str], Dict]):
+        """Parse a file if it changed since it was last parsed, None if it
+        did not change or could not be parsed again (its last content is
+        then kept)."""
+        signature = file_signature(path)
+        if signature == self._signatures.get(path):
+            return None
+        try:
+            if signature is None:
+                raise FileNotFoundError(path)
+            parsed = parse(path)
+        except (OSError, ValueError) as err:
+            if path not in self._signatures:
+                raise
+            logging.warning(
+                "Could not reload %s, keeping its last content: %r", path, err
+            )
+            return None
+        self._signatures[path] = signature
+        return parsed
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self.reload(force=False)
+
+    def check_password(self, username: str, password: str) -> bool:
+        """Check a user's password, usable as BasicAuth's `auth_func`."""
+        self._maybe_reload()
+        hashed = self._users.get(username)
+        if hashed is None:
+            return False
+        key = (
+            username,
+            hashed,
+            hmac.new(self._cache_key, password.encode(), "sha256").digest(),
+        )
+        if self._verified.get(key):
+            return True
+        if verify_password(hashed, password):
+            self._verified.set(key, True)
+            return True
+        return False
+
+    def get_groups(self, username: str) -> List[str]:
+        """Get a user's groups, usable as BasicAuth's `user_groups`."""
+        self._maybe_reload()
+        return list(self._groups.get(username, []))
+
+    def __contains__(self, username: str) -> bool:
+        self._maybe_reload()
+        return username in self._users
+
+    def __len__(self) -> int:
+        return len(self._users)
@@ -0,0 +1,106 @@
+from typing import Dict, Optional
+
+from flask import Request
+
+
+class IdPDiscovery:
+    """Home-realm discovery: pick the OIDC provider of a user without
+    asking them to choose one.
+
+    The provider is looked up, in this order, from:
+    * the domain of the email in the `login_hint` query parameter,
+      e.g. "?login_hint=jane@example.com" (subdomains match their parent
+      domain's rule)
+    * the last provider the browser logged in with (hint cookie)
+    * the request host, e.g. "app.example.com"
+    * the longest matching path prefix, e.g. "/partners"
+
+    Rules are compiled into dicts, so that each lookup costs a few dict
+    lookups whatever the number of rules.
+    """
+
+    def __init__(
+        self,
+        domains: Optional[Dict[str, str]] = None,
+        hosts: Optional[Dict[str, str]] = None,
+        path_prefixes: Optional[Dict[str, str]] = None,
+        login_hint_param: str = "login_hint",
+        cookie_name: Optional[str] = "dash_auth_idp",
+        cookie_max_age: int = 30 * 24 * 3600,
+    ):
+        """
+        :param domains: dict of email domains to provider names
+        :param hosts: dict of request hosts to provider names
+        :param path_prefixes: dict of path prefixes to provider names
+        :param login_hint_param: query parameter holding the login hint
+        :param cookie_name: name of the cookie remembering the last
+            provider of the browser, None to disable it
+        :param cookie_max_age: lifetime of the cookie in seconds
+        """
+        self.domains = {
+            domain.lower().lstrip("@"): idp
+            for domain, idp in (domains or {}).items()
+        }
+        self.hosts = {host.lower(): idp for host, idp in (hosts or {}).items()}
+        self.path_prefixes = {
+            "/" + prefix.strip("/"): idp
+            for prefix, idp in (path_prefixes or {}).items()
+        }
+        self.login_hint_param = login_hint_param
+        self.cookie_name = cookie_name
+        self.cookie_max_age = cookie_max_age
+
+    def login_hint(self, request: Request) -> Optional[str]:
+        return request.args.get(self.login_hint_param) or None
+
+    def _from_domain(self, login_hint: str) -> Optional[str]:
+        domain = login_hint.rpartition("@")[2].lower()
+        while domain:
+            if domain in self.domains:
+                return self.domains[domain]
+            domain = domain.partition(".")[2]
+        return None
+
+    def _from_host(self, host: str) -> Optional[str]:
+        host = host.lower()
+        return self.hosts.get(host) or self.hosts.get(host.partition(":")[0])
+
+    def _from_path(self, path: str) -> Optional[str]:
+        path = "/" + path.strip("/")
+        while True:
+            if path in self.path_prefixes:
+                return self.path_prefixes[path]
+            if path == "/":
+                return None
+            path = path.rpartition("/")[0] or "/"
+
+    def discover(self, request: Request) -> Optional[str]:
+        """Name of the provider to use for the request, None if unknown."""
+        login_hint = self.login_hint(request)
+        if login_hint and self.domains:
+            idp = self._from_domain(login_hint)
+            if idp is not None:
+                return idp
+        if self.cookie_name and not login_hint:
+            idp = request.cookies.get(self.cookie_name)
+            if idp:
+                return idp
+        if self.hosts:
+            idp = self._from_host(request.host)
+            if idp is not None:
+                return idp
+        if self.path_prefixes:
+            return self._from_path(request.path)
+        return None
+
+    def remember(self, response, idp: str):
+        """Set the last provider cookie on the response."""
+        if self.cookie_name:
+            response.set_cookie(
+                self.cookie_name,
+                idp,
+                max_age=self.cookie_max_age,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,105 @@
+from typing import Any, Dict, Hashable, List, Optional, Union
+
+from dash import Dash
+from flask import Response
+
+from .cache import SingleFlight, TTLCache
+from .group_protection import list_groups
+
+# Group signature of unauthenticated users
+ANONYMOUS = ("<anonymous>",)
+
+
+class LayoutCache:
+    """Serve the app layout from a cache keyed by the user's groups.
+
+    The layout is built and serialized to JSON once per group signature
+    (the sorted set of the user's groups), and the JSON is then served as
+    is to all the users with the same groups. Use it when the layout only
+    depends on the user's groups, e.g. layouts wrapped with `protected`,
+    and not on the user itself or the time.
+
+    Usage:
+    >>> layout_cache = LayoutCache(app)
+    >>> # After a change affecting the layouts, e.g. a deployment
+    >>> layout_cache.invalidate()
+    """
+
+    def __init__(
+        self,
+        app: Dash,
+        maxsize: int = 128,
+        ttl: Optional[float] = None,
+        groups_key: str = "groups",
+        groups_str_split: str = None,
+    ):
+        """
+        :param app: Dash app
+        :param maxsize: Maximum number of cached layouts (i.e. of group
+            signatures), the least recently used are evicted first
+        :param ttl: Time in seconds a layout is cached, None for no expiry
+        :param groups_key: Groups key in the user data
+        :param groups_str_split: Used to split groups if provided as a string
+        """
+        self.app = app
+        self.groups_key = groups_key
+        self.groups_str_split = groups_str_split
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._builds = SingleFlight()
+        endpoint = app.config.routes_pathname_prefix + "_dash-layout"
+        view_functions = app.server.view_functions
+        if endpoint not in view_functions:
+            raise ValueError(
+                "LayoutCache requires the Dash app to be attached to its "
+                "server, create it after `app.init_app`."
+            )
+        self._serve_layout = view_functions[endpoint]
+        view_functions[endpoint] = self.serve_layout
+
+    @staticmethod
+    def signature(groups: Optional[Union[List[str], str]]) -> Hashable:
+        """Normalized group signature, independent of the groups' order
+        and duplicates."""
+        if groups is None:
+            return ANONYMOUS
+        # A single group not split with `groups_str_split`
+        if isinstance(groups, str):
+            groups = [groups]
+        return tuple(sorted(set(groups)))
+
+    def serve_layout(self):
+        key = self.signature(list_groups(
+            groups_key=self.groups_key,
+            groups_str_split=self.groups_str_split,
+        ))
+        data = self.cache.get(key)
+        if data is None:
+            # Concurrent misses for the same groups build the layout once
+            data = self._builds.do(key, lambda: self._build(key))
+        if isinstance(data, Response):
+            return data
+        return Response(data, mimetype="application/json")
+
+    def _build(self, key: Hashable):
+        response = self._serve_layout()
+        if not isinstance(response, Response) or response.status_code != 200:
+            return response
+        data = response.get_data()
+        self.cache.set(key, data)
+        return data
+
+    def invalidate(self, groups: Optional[List[str]] = None):
+        """Remove the cached layout of the given groups, or all the cached
+        layouts if no groups are passed."""
+        if groups is None:
+            self.cache.clear()
+        else:
+            self.cache.delete(self.signature(groups))
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of cached layouts, cache hits and misses."""
+        return {
+            "size": len(self.cache),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+        }
@@ -0,0 +1,92 @@
+from typing import Dict, Union
+
+from .auth import (
+    Auth, CALLBACK_ROUTE, CREDENTIAL_CACHE_ENVIRON_KEY, PUBLIC_ENVIRON_KEY
+)
+from .cache import TTLCache
+from .public_routes import get_public_registry
+
+
+class AuthMiddleware:
+    """WSGI middleware classifying requests before Flask dispatches them.
+
+    Public routes are matched from the WSGI environ against the compiled
+    public routes of the mounted app serving the path, and passed straight
+    through, the Flask
+    `before_request` check then returns immediately. Requests that the
+    auth can reject from the environ alone (e.g. missing or previously
+    rejected Basic credentials) get the login response without reaching
+    Flask. All other requests go through the usual Flask check.
+
+    Usage:
+    >>> app.server.wsgi_app = AuthMiddleware(app.server.wsgi_app, auth)
+
+    Several Dash apps mounted with werkzeug's `DispatcherMiddleware` share
+    the credential cache of one middleware, each path being only matched
+    against the public routes of its own mount:
+    >>> application = AuthMiddleware(
+    ...     DispatcherMiddleware(app1.server, {"/app2": app2.server}),
+    ...     {"": auth1, "/app2": auth2},
+    ... )
+    """
+
+    def __init__(
+        self,
+        wsgi_app,
+        auths: Union[Auth, Dict[str, Auth]],
+        credential_cache_size: int = 10000,
+        credential_cache_ttl: float = 60,
+    ):
+        """
+        :param wsgi_app: The WSGI app to wrap
+        :param auths: The Auth protecting the app, or a dict of mount
+            prefix to Auth when wrapping a DispatcherMiddleware
+        :param credential_cache_size: Maximum number of rejected credentials
+            remembered
+        :param credential_cache_ttl: Time in seconds rejected credentials
+            are remembered and rejected without reaching Flask
+        """
+        self.wsgi_app = wsgi_app
+        if isinstance(auths, Auth):
+            auths = {"": auths}
+        self.mounts = {
+            prefix.rstrip("/"): auth for prefix, auth in auths.items()
+        }
+        # Longest prefixes first
+        self._prefixes = sorted(self.mounts, key=len, reverse=True)
+        self.credential_cache = TTLCache(
+            maxsize=credential_cache_size, ttl=credential_cache_ttl
+        )
+
+    def _is_public(self, prefix: str, path: str) -> bool:
+        """Whether the path is a public route of the app mounted at the
+        prefix, the public routes of other mounts are never matched."""
+        routes = get_public_registry(self.mounts[prefix].app).snapshot.routes
+        return routes.test(path[len(prefix):] or "/")
+
+    def _mount(self, path: str) -> str:
+        for prefix in self._prefixes:
+            if not prefix or path == prefix or path.startswith(prefix + "/"):
+                return prefix
+        return None
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO") or "/"
+        prefix = self._mount(path)
+        if prefix is None:
+            return self.wsgi_app(environ, start_response)
+
+        environ[CREDENTIAL_CACHE_ENVIRON_KEY] = self.credential_cache
+        is_public = environ[PUBLIC_ENVIRON_KEY] = self._is_public(
+            prefix, path
+        )
+        auth = self.mounts[prefix]
+        if (
+            not is_public
+            # Callbacks can be public or routing callbacks,
+            # this is only known from the request body
+            and path[len(prefix):] != CALLBACK_ROUTE
+            and auth.rejects_environ(environ)
+        ):
+            return auth.login_request()(environ, start_response)
+        return self.wsgi_app(environ, start_response)
@@ -1,13 +1,26 @@
+import copy
+import hashlib
 import logging
 import os
 import re
-from typing import Optional, Union, TYPE_CHECKING
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Optional, Union, TYPE_CHECKING
 
 import dash
 from authlib.integrations.base_client import OAuthError
 from authlib.integrations.flask_client import OAuth
+from dash_auth.audit import audit_event
 from dash_auth.auth import Auth
-from flask import Response, redirect, request, session, url_for
+from dash_auth.cache import SingleFlight, TTLCache
+from dash_auth.group_protection import REQUEST_USER
+from dash_auth.idp_discovery import IdPDiscovery
+from dash_auth.oidc_client import OAuthRegistry, PooledHTTPAdapter
+from dash_auth.revocation import RevocationList
+from flask import Response, g, redirect, request, session, url_for
 from werkzeug.routing import Map, Rule
 
 if TYPE_CHECKING:
@@ -32,6 +45,24 @@ class OIDCAuth(Auth):
         public_routes: Optional[list] = None,
         logout_page: Union[str, Response] = None,
         secure_session: bool = False,
+        http_pool_maxsize: int = 10,
+        http_pool_hosts: int = 4,
+        http_timeout: float = 10.0,
+        http_retries: int = 3,
+        max_login_states: int = 5,
+        login_state_ttl: int = 600,
+        login_state_cache=None,
+        token_introspection: Union[bool, str] = False,
+        introspection_cache_size: int = 10000,
+        introspection_cache_ttl: int = 300,
+        introspection_audience: Optional[str] = None,
+        revocation_list: Optional[Union[str, RevocationList]] = None,
+        idp_discovery: Optional[IdPDiscovery] = None,
+        tenants: Optional[Dict[str, Dict[str, dict]]] = None,
+        tenant_idle_timeout: float = 3600,
+        session_idle_timeout: Optional[float] = None,
+        session_max_lifetime: Optional[float] = None,
+        session_refresh_threshold: float = 0.5,
     ):
         """Secure a Dash app through OpenID Connect.
 
@@ -76,6 +107,86 @@ class OIDCAuth(Auth):
             Whether to ensure the session is secure, setting the flasck config
             SESSION_COOKIE_SECURE and SESSION_COOKIE_HTTPONLY to True,
             by default False
+        http_pool_maxsize : int, optional
+            Maximum number of keep-alive connections kept per provider,
+            by default 10. Calls to a provider (metadata, JWKS, token
+            exchange, userinfo) share a connection pool, so logins reuse
+            established TLS connections.
+        http_pool_hosts : int, optional
+            Number of hosts of each provider whose connections are kept
+            alive, by default 4 (e.g. separate token, JWKS and userinfo
+            hosts)
+        http_timeout : float, optional
+            Timeout in seconds for the calls to the providers, by default 10
+        http_retries : int, optional
+            Number of retries with exponential backoff for the calls to the
+            providers, by default 3. Only connection errors are retried for
+            non-idempotent requests such as the token exchange.
+        max_login_states : int, optional
+            Maximum number of pending login attempts (state and nonce)
+            kept in the session per provider, by default 5.
+            The oldest attempts are dropped first.
+        login_state_ttl : int, optional
+            Time in seconds after which a pending login attempt expires,
+            by default 600
+        login_state_cache : optional
+            Server-side store for the pending login attempts, with
+            authlib's cache interface (`get`, `set`, `delete`), e.g.
+            `dash_auth.cache.TTLCache` for single-process servers.
+            When set, only the expiry of each attempt is kept in the session.
+            By default None, storing the attempts in the session.
+        token_introspection : Union[bool, str], optional
+            Whether to accept requests authenticated with an (opaque)
+            bearer token in the Authorization header, validated against the
+            provider's token introspection endpoint (RFC 7662),
+            by default False.
+            If a string is passed, it is the name of the provider to use,
+            otherwise the single registered provider is used (a name is
+            required with tenant providers).
+            The token's claims are available through `get_user`
+            and the group functions, they are not saved in the session.
+        introspection_cache_size : int, optional
+            Maximum number of introspection results cached, by default 10000
+        introspection_cache_ttl : int, optional
+            Maximum time in seconds an introspection result is cached,
+            by default 300. Results are never cached past the token's `exp`.
+        introspection_audience : str, optional
+            Client the introspected tokens must be issued to (`client_id`
+            claim) or intended for (`aud` claim), by default the client ID
+            of the provider. Tokens issued to other clients of the provider
+            are rejected.
+        revocation_list : Union[str, RevocationList], optional
+            Server-side list of revoked sessions, or the path of the SQLite
+            file to store it in, by default None.
+            Each session gets a session id (`session["sid"]`) at login,
+            which is revoked on logout or with `revoke_session`, after which
+            copies of the session cookie are no longer authorized.
+        idp_discovery : IdPDiscovery, optional
+            Rules picking the provider of a user when several providers
+            are registered (email domain of a login hint, host, path
+            prefix, last provider used by the browser), by default None.
+            The `idp_selection_route` is only used when no rule matches.
+        tenants : dict, optional
+            Providers of each tenant, by request host, by default None:
+            {host: {idp_name: register_provider kwargs}}.
+            Users of a host can only log in with the host's providers, and
+            sessions are only valid on the host of their provider.
+            The OAuth clients are registered on first use, and
+            unregistered after `tenant_idle_timeout` seconds without use.
+        tenant_idle_timeout : float, optional
+            Time in seconds after which an unused tenant provider is
+            unregistered, by default 3600
+        session_idle_timeout : float, optional
+            Time in seconds after which a session without requests expires,
+            by default None (no idle timeout)
+        session_max_lifetime : float, optional
+            Time in seconds after the login after which a session expires
+            whatever its activity, by default None (no absolute lifetime)
+        session_refresh_threshold : float, optional
+            Fraction of the idle timeout below which the remaining lifetime
+            of a session is extended, by default 0.5.
+            The session cookie is only re-signed and sent again when its
+            lifetime is extended, not on every response.
 
         Raises
         ------
@@ -123,7 +234,60 @@ class OIDCAuth(Auth):
             app.server.config["SESSION_COOKIE_SECURE"] = True
             app.server.config["SESSION_COOKIE_HTTPONLY"] = True
 
-        self.oauth = OAuth(app.server)
+        self.http_pool_maxsize = http_pool_maxsize
+        self.http_pool_hosts = http_pool_hosts
+        self.http_timeout = http_timeout
+        self.http_retries = http_retries
+        self._http_adapters: Dict[str, PooledHTTPAdapter] = {}
+        self.max_login_states = max_login_states
+        self.login_state_ttl = login_state_ttl
+
+        if token_introspection is True and tenants:
+            raise ValueError(
+                "token_introspection must be the name of the provider to "
+                "use when tenant providers are configured."
+            )
+        self.token_introspection = token_introspection
+        self.introspection_audience = introspection_audience
+        self._introspection_cache = TTLCache(
+            maxsize=introspection_cache_size, ttl=introspection_cache_ttl
+        )
+        self._introspection_calls = SingleFlight()
+
+        if isinstance(revocation_list, str):
+            revocation_list = RevocationList(revocation_list)
+        self.revocation_list = revocation_list
+        self.idp_discovery = idp_discovery
+
+        # Tenant providers by host, and tenant provider configs by name
+        self.tenants: Dict[str, Dict[str, dict]] = {}
+        self._tenant_providers: Dict[str, dict] = {}
+        for host, providers in (tenants or {}).items():
+            self.tenants[host.lower()] = providers
+            for idp_name, config in providers.items():
+                if self._tenant_providers.get(idp_name, config) != config:
+                    raise ValueError(
+                        f"Tenant provider '{idp_name}' has several configs, "
+                        "provider names must be unique."
+                    )
+                self._tenant_providers[idp_name] = config
+        self.tenant_idle_timeout = tenant_idle_timeout
+
+        self.session_idle_timeout = session_idle_timeout
+        self.session_max_lifetime = session_max_lifetime
+        self.session_refresh_threshold = session_refresh_threshold
+        if session_idle_timeout or session_max_lifetime:
+            # Persistent cookies expiring with the session, only sent
+            # again when the session is modified
+            app.server.config["PERMANENT_SESSION_LIFETIME"] = timedelta(
+                seconds=session_idle_timeout or session_max_lifetime
+            )
+            app.server.config["SESSION_REFRESH_EACH_REQUEST"] = False
+        # Registered tenant providers, least recently used first
+        self._tenant_last_used: OrderedDict = OrderedDict()
+        self._tenant_lock = threading.Lock()
+
+        self.oauth = OAuthRegistry(app.server, cache=login_state_cache)
 
         # Check that the login and callback rules have an <idp> placeholder
         if not re.findall(r"/<idp>(?=/|$)", login_route):
@@ -175,12 +339,85 @@ class OIDCAuth(Auth):
             )
         client_kwargs = kwargs.pop("client_kwargs", {})
         client_kwargs.setdefault("scope", "openid email")
-        self.oauth.register(
+        client = self.oauth.register(
             idp_name, client_kwargs=client_kwargs, **kwargs
         )
+        client.framework.expires_in = self.login_state_ttl
+        client.framework.max_states = self.max_login_states
+        if hasattr(client, "http_adapter"):
+            adapter = self._http_adapters.pop(idp_name, None)
+            if adapter is not None:
+                adapter.shutdown()
+            adapter = PooledHTTPAdapter(
+                pool_maxsize=self.http_pool_maxsize,
+                pool_hosts=self.http_pool_hosts,
+                timeout=self.http_timeout,
+                retries=self.http_retries,
+            )
+            client.http_adapter = adapter
+            self._http_adapters[idp_name] = adapter
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Connection pool statistics for each registered provider.
+
+        See `PooledHTTPAdapter.stats` for the available statistics.
+        """
+        return {
+            idp: adapter.stats()
+            for idp, adapter in self._http_adapters.items()
+        }
+
+    def _host_providers(self) -> Optional[Dict[str, dict]]:
+        """Providers of the tenant of the request host, None if there are
+        no tenants."""
+        if not self.tenants:
+            return None
+        host = request.host.lower()
+        providers = self.tenants.get(host)
+        if providers is None:
+            providers = self.tenants.get(host.partition(":")[0], {})
+        return providers
+
+    def _available_idps(self) -> List[str]:
+        """Names of the providers users can log in with on this request."""
+        providers = self._host_providers()
+        if providers is None:
+            return list(self.oauth._registry)
+        return list(providers)
+
+    def _load_provider(self, idp: str):
+        """Register a tenant provider if needed, and unregister the tenant
+        providers unused for `tenant_idle_timeout` seconds."""
+        if idp not in self._tenant_providers:
+            return
+        now = time.monotonic()
+        with self._tenant_lock:
+            if idp not in self.oauth._registry:
+                self.register_provider(
+                    idp, **copy.deepcopy(self._tenant_providers[idp])
+                )
+            self._tenant_last_used[idp] = now
+            self._tenant_last_used.move_to_end(idp)
+            while self._tenant_last_used:
+                oldest, last_used = next(iter(self._tenant_last_used.items()))
+                if (
+                    oldest == idp
+                    or now - last_used < self.tenant_idle_timeout
+                ):
+                    break
+                del self._tenant_last_used[oldest]
+                self._unregister_provider(oldest)
+
+    def _unregister_provider(self, idp: str):
+        self.oauth._registry.pop(idp, None)
+        self.oauth._clients.pop(idp, None)
+        adapter = self._http_adapters.pop(idp, None)
+        if adapter is not None:
+            adapter.shutdown()
 
     def get_oauth_client(self, idp: str):
         """Get the OAuth client."""
+        self._load_provider(idp)
         if idp not in self.oauth._registry:
             raise ValueError(f"'{idp}' is not a valid registered idp")
 
@@ -191,6 +428,7 @@ class OIDCAuth(Auth):
 
     def get_oauth_kwargs(self, idp: str):
         """Get the OAuth kwargs."""
+        self._load_provider(idp)
         if idp not in self.oauth._registry:
             raise ValueError(f"'{idp}' is not a valid registered idp")
 
@@ -213,13 +451,28 @@ class OIDCAuth(Auth):
     def login_request(self, idp: str = None):
         """Start the login process."""
 
+        # Clients authenticating with a bearer token cannot follow the
+        # login redirects
+        if self.token_introspection and self._get_bearer_token():
+            return Response(
+                "Invalid token",
+                headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
+                status=401,
+            )
+
         # `idp` can be none here as login_request is called
         # without arguments in the before_request hook
-        if idp not in self.oauth._registry:
-            # If only one provider is registered, we don't need to
+        available_idps = self._available_idps()
+        if idp not in available_idps and self.idp_discovery is not None:
+            # Use the provider picked by the discovery rules, if any
+            idp = self.idp_discovery.discover(request)
+        if idp not in available_idps:
+            # If only one provider is available, we don't need to
             # ask the user to pick one, just use the one
-            if len(self.oauth._registry) == 1:
-                idp = next(iter(self.oauth._clients))
+            if len(available_idps) == 1:
+                idp = available_idps[0]
+            elif not available_idps:
+                return "No OAuth provider is configured for this host.", 404
             # If there are several providers and a `idp_selection_route`
             # was provided, redirect to it.
             elif self.idp_selection_route:
@@ -234,13 +487,23 @@ class OIDCAuth(Auth):
         redirect_uri = self._create_redirect_uri(idp)
         oauth_client = self.get_oauth_client(idp)
         oauth_kwargs = self.get_oauth_kwargs(idp)
-        return oauth_client.authorize_redirect(
-            redirect_uri,
-            **oauth_kwargs.get("authorize_redirect_kwargs", {}),
-        )
+        redirect_kwargs = oauth_kwargs.get("authorize_redirect_kwargs", {})
+        if self.idp_discovery is not None:
+            login_hint = self.idp_discovery.login_hint(request)
+            if login_hint:
+                redirect_kwargs = {"login_hint": login_hint, **redirect_kwargs}
+        return oauth_client.authorize_redirect(redirect_uri, **redirect_kwargs)
 
     def logout(self):  # pylint: disable=C0116
         """Logout the user."""
+        if session.get("sid"):
+            self.revoke_session(session["sid"])
+        if session.get("user"):
+            audit_event(
+                "signout",
+                user=session["user"].get("email"),
+                sid=session.get("sid"),
+            )
         session.clear()
         base_url = self.app.config.get("url_base_pathname") or "/"
         page = self.logout_page or f"""
@@ -252,9 +515,17 @@ class OIDCAuth(Auth):
         """
         return page
 
+    def revoke_session(self, sid: str):
+        """Revoke a session, given its session id.
+
+        Requires a `revocation_list`, otherwise this is a no-op.
+        """
+        if self.revocation_list is not None:
+            self.revocation_list.revoke(sid)
+
     def callback(self, idp: str):  # pylint: disable=C0116
         """Handle the OIDC dance and post-login actions."""
-        if idp not in self.oauth._registry:
+        if idp not in self._available_idps():
             return f"'{idp}' is not a valid registered idp", 400
 
         oauth_client = self.get_oauth_client(idp)
@@ -267,7 +538,14 @@ class OIDCAuth(Auth):
             return str(err), 401
 
         user = token.get("userinfo")
-        return self.after_logged_in(user, idp, token)
+        response = self.after_logged_in(user, idp, token)
+        if (
+            self.idp_discovery is not None
+            and "user" in session
+            and isinstance(response, Response)
+        ):
+            self.idp_discovery.remember(response, idp)
+        return response
 
     def after_logged_in(self, user: Optional[dict], idp: str,  token: dict):
         """
@@ -282,17 +560,172 @@ class OIDCAuth(Auth):
         if user:
             session["user"] = user
             session["idp"] = idp
+            session["sid"] = secrets.token_urlsafe(16)
+            self._start_session_lifetime()
             oauth_scope = self.get_oauth_client(idp).client_kwargs["scope"]
             if "offline_access" in oauth_scope:
                 session["refresh_token"] = token.get("refresh_token")
             if self.log_signins:
-                logging.info("User %s is logging in.", user.get("email"))
+                logging.info(
+                    "User %s is logging in (session %s).",
+                    user.get("email"),
+                    session["sid"],
+                )
+            audit_event(
+                "signin", user=user.get("email"), idp=idp, sid=session["sid"]
+            )
 
         return redirect(self.app.config.get("url_base_pathname") or "/")
 
+    def _session_expiry(self, created_at: int, now: float) -> Optional[int]:
+        expiries = []
+        if self.session_idle_timeout:
+            expiries.append(now + self.session_idle_timeout)
+        if self.session_max_lifetime:
+            expiries.append(created_at + self.session_max_lifetime)
+        return int(min(expiries)) if expiries else None
+
+    def _start_session_lifetime(self):
+        if self.session_idle_timeout or self.session_max_lifetime:
+            now = time.time()
+            session.permanent = True
+            session["created_at"] = int(now)
+            session["expires_at"] = self._session_expiry(int(now), now)
+
+    def _check_session_lifetime(self) -> bool:
+        """Whether the session has not expired, extending its lifetime
+        when less than `session_refresh_threshold` of the idle timeout
+        remains."""
+        expires_at = session.get("expires_at")
+        if expires_at is None:
+            # Session opened before the lifetime policy was enabled
+            self._start_session_lifetime()
+            return True
+        now = time.time()
+        if now >= expires_at:
+            audit_event(
+                "session_expired",
+                user=session["user"].get("email"),
+                sid=session.get("sid"),
+            )
+            session.clear()
+            return False
+        if (
+            self.session_idle_timeout
+            and expires_at - now
+            < self.session_idle_timeout * self.session_refresh_threshold
+        ):
+            new_expires_at = self._session_expiry(session["created_at"], now)
+            # Assigning the session marks it as modified, re-sending the
+            # cookie, which is only done when the lifetime is extended
+            if new_expires_at > expires_at:
+                session["expires_at"] = new_expires_at
+        return True
+
+    @staticmethod
+    def _get_bearer_token() -> Optional[str]:
+        header = request.headers.get("Authorization", "")
+        if header[:7].lower() == "bearer ":
+            return header[7:].strip() or None
+        return None
+
+    def introspect_token(self, token: str) -> Optional[dict]:
+        """Validate a token with the provider's introspection endpoint.
+
+        Results are cached by token hash, and concurrent introspections
+        of the same token are deduplicated into a single call.
+
+        :param token: The access token
+        :return: The token claims if the token is active, None otherwise
+        """
+        key = hashlib.sha256(token.encode()).hexdigest()
+        claims = self._introspection_cache.get(key)
+        if claims is None:
+            claims = self._introspection_calls.do(
+                key, lambda: self._introspect_token(key, token)
+            )
+        return claims if claims.get("active") else None
+
+    def _introspect_token(self, key: str, token: str) -> dict:
+        # Another caller may have completed the introspection meanwhile
+        claims = self._introspection_cache.get(key)
+        if claims is not None:
+            return claims
+
+        if isinstance(self.token_introspection, str):
+            idp = self.token_introspection
+        else:
+            idps = list(self.oauth._registry)
+            if len(idps) != 1:
+                raise RuntimeError(
+                    "token_introspection must be the name of the provider "
+                    "to use when several providers are registered."
+                )
+            idp = idps[0]
+        oauth_client = self.get_oauth_client(idp)
+        metadata = oauth_client.load_server_metadata()
+        url = metadata.get("introspection_endpoint")
+        if not url:
+            raise RuntimeError(
+                f"'{idp}' does not define an introspection_endpoint"
+            )
+        with oauth_client._get_oauth_client(**metadata) as client:
+            resp = client.introspect_token(
+                url, token=token, token_type_hint="access_token"
+            )
+            resp.raise_for_status()
+            claims = resp.json()
+
+        audience = self.introspection_audience or oauth_client.client_id
+        if claims.get("active") and not self._is_token_audience(
+            claims, audience
+        ):
+            logging.warning(
+                "Rejected an active token issued to another client: %s.",
+                claims.get("client_id"),
+            )
+            claims = {"active": False}
+
+        ttl = self._introspection_cache.ttl
+        if claims.get("active"):
+            if "exp" in claims:
+                ttl = min(ttl, claims["exp"] - time.time())
+            if ttl <= 0:
+                claims = {"active": False}
+                ttl = self._introspection_cache.ttl
+        self._introspection_cache.set(key, claims, ttl=ttl)
+        return claims
+
+    @staticmethod
+    def _is_token_audience(claims: dict, audience: str) -> bool:
+        """Whether a token was issued to or is intended for the audience."""
+        aud = claims.get("aud", [])
+        if isinstance(aud, str):
+            aud = [aud]
+        return claims.get("client_id") == audience or audience in aud
+
+    def _is_token_authorized(self, token: str) -> bool:
+        try:
+            claims = self.introspect_token(token)
+        except Exception:
+            logging.exception("Error during token introspection.")
+            return False
+        if claims is None:
+            return False
+
+        user = {k: v for k, v in claims.items() if k != "active"}
+        user.setdefault("email", claims.get("username") or claims.get("sub"))
+        setattr(g, REQUEST_USER, user)
+        return True
+
     def is_authorized(self):  # pylint: disable=C0116
         """Check whether ther user is authenticated."""
 
+        if self.token_introspection:
+            token = self._get_bearer_token()
+            if token:
+                return self._is_token_authorized(token)
+
         map_adapter = Map(
             [
                 Rule(x)
@@ -305,7 +738,22 @@ class OIDCAuth(Auth):
                 if x
             ]
         ).bind("")
-        return map_adapter.test(request.path) or "user" in session
+        if map_adapter.test(request.path):
+            return True
+        if "user" not in session:
+            return False
+        # Sessions are only valid on the hosts of their provider's tenant
+        if self.tenants and session.get("idp") not in self._host_providers():
+            return False
+        if (
+            self.revocation_list is not None
+            and self.revocation_list.is_revoked(session.get("sid"))
+        ):
+            session.clear()
+            return False
+        if self.session_idle_timeout or self.session_max_lifetime:
+            return self._check_session_lifetime()
+        return True
 
 
 def get_oauth(app: dash.Dash = None) -> OAuth:
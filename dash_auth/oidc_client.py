@@ -0,0 +1,169 @@
+import threading
+import time
+from typing import Dict
+
+from authlib.integrations.flask_client import (
+    FlaskIntegration, FlaskOAuth2App, OAuth
+)
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTP adapter shared by all the sessions created for one provider.
+
+    authlib opens (and closes) a new requests session for each call to the
+    provider, so each token exchange pays for a new TCP/TLS connection.
+    Mounting the same adapter on all of these sessions keeps the connections
+    alive in its pool and reuses them across requests and threads.
+    """
+
+    def __init__(
+        self,
+        pool_maxsize: int = 10,
+        pool_hosts: int = 4,
+        timeout: float = 10.0,
+        retries: int = 3,
+        backoff_factor: float = 0.3,
+    ):
+        """
+        :param pool_maxsize: Maximum number of connections kept alive
+            per provider host
+        :param pool_hosts: Number of provider hosts whose connections are
+            kept alive, providers often serve the token, JWKS and userinfo
+            endpoints from different hosts
+        :param timeout: Default (connect and read) timeout in seconds
+        :param retries: Number of retries on connection errors, and on
+            5xx responses for idempotent requests
+        :param backoff_factor: Exponential backoff factor between retries
+        """
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        super().__init__(
+            pool_connections=pool_hosts,
+            pool_maxsize=pool_maxsize,
+            pool_block=False,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=(500, 502, 503, 504),
+                # Token exchanges are POST requests: authorization codes are
+                # single-use so only connection errors are retried for them
+                allowed_methods=frozenset(["GET", "HEAD"]),
+                raise_on_status=False,
+            ),
+        )
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+        with self._lock:
+            self._requests += 1
+        try:
+            return super().send(request, timeout=timeout, **kwargs)
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def close(self):
+        # authlib closes its sessions after each call, which closes the
+        # mounted adapters, the pool must outlive them
+        pass
+
+    def shutdown(self):
+        """Close all the pooled connections."""
+        super().close()
+
+    def stats(self) -> Dict[str, int]:
+        """Pool statistics.
+
+        * requests: number of requests sent through the adapter
+        * errors: number of requests that failed with an exception
+        * connections: number of connections opened
+        * idle: number of connections currently idle in the pool
+        """
+        connections = idle = 0
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            idle += pool.pool.qsize() if pool.pool is not None else 0
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "errors": self._errors,
+                "connections": connections,
+                "idle": idle,
+            }
+
+
+class PooledFlaskOAuth2App(FlaskOAuth2App):
+    """Flask OAuth2 client sending its requests through a shared adapter."""
+
+    http_adapter: HTTPAdapter = None
+
+    def _mount(self, session):
+        if self.http_adapter is not None:
+            session.mount("https://", self.http_adapter)
+            session.mount("http://", self.http_adapter)
+        return session
+
+    def _get_session(self):
+        return self._mount(super()._get_session())
+
+    def _get_oauth_client(self, **metadata):
+        return self._mount(super()._get_oauth_client(**metadata))
+
+
+class BoundedStateIntegration(FlaskIntegration):
+    """Flask integration bounding the login states kept in the session.
+
+    authlib saves the state (and nonce) of each login attempt in the
+    session and only clears expired entries when a login completes, so
+    abandoned attempts (several tabs, back and forth with the IDP) keep
+    inflating the session cookie. Here, expired states are dropped and
+    only the `max_states` most recent states are kept whenever a new
+    login attempt starts.
+    """
+
+    expires_in = 600
+    max_states = 5
+
+    def _bound_session_state(self, session):
+        prefix = f"_state_{self.name}_"
+        now = time.time()
+        states = []
+        for key in list(session.keys()):
+            if not key.startswith(prefix):
+                continue
+            exp = session[key].get("exp")
+            if not exp or exp < now:
+                self._drop_state(session, key)
+            else:
+                states.append((exp, key))
+        # Make room for the new state, evicting the oldest ones
+        states.sort()
+        for _, key in states[:max(len(states) - self.max_states + 1, 0)]:
+            self._drop_state(session, key)
+
+    def _drop_state(self, session, key):
+        if self.cache:
+            self.cache.delete(key)
+        session.pop(key, None)
+
+    def set_state_data(self, session, state, data):
+        self._bound_session_state(session)
+        super().set_state_data(session, state, data)
+
+
+class OAuthRegistry(OAuth):
+    """authlib Flask OAuth registry creating pooled OAuth2 clients
+    with bounded login states."""
+
+    oauth2_client_cls = PooledFlaskOAuth2App
+    framework_integration_cls = BoundedStateIntegration
@@ -0,0 +1,79 @@
+from typing import List, NamedTuple, Optional, Tuple
+
+import dash
+from dash import Dash
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, MapAdapter, Rule
+
+from .group_protection import CheckType, check_groups
+
+
+class PageGroups(NamedTuple):
+    """Group requirement of a page."""
+
+    groups: List[str]
+    check_type: CheckType
+
+
+class PageGroupIndex:
+    """Index of the group requirements declared on Dash pages.
+
+    Requirements are declared when registering a page:
+    >>> dash.register_page(__name__, groups=["admin"])
+    >>> dash.register_page(
+    ...     __name__, groups=["admin", "owner"], groups_check_type="all_of"
+    ... )
+
+    They are compiled into a route map on first use, and recompiled only
+    when pages are registered since.
+    """
+
+    def __init__(self, app: Dash):
+        self.app = app
+        # Route map, requirements by rule endpoint and number of pages,
+        # published together in a single assignment
+        self._index: Tuple[Optional[MapAdapter], list, int] = (None, [], -1)
+
+    def _compile(self) -> Tuple[Optional[MapAdapter], list, int]:
+        pages = list(dash.page_registry.values())
+        rules, requirements = [], []
+        for page in pages:
+            if page.get("groups") is None:
+                continue
+            if page.get("path_template"):
+                path = self.app.get_relative_path(page["path_template"])
+            else:
+                path = page["relative_path"]
+            rules.append(Rule(path, endpoint=len(requirements)))
+            requirements.append(PageGroups(
+                list(page["groups"]),
+                page.get("groups_check_type", "one_of"),
+            ))
+        adapter = None
+        if rules:
+            routes_map = Map(rules)
+            routes_map.update()
+            adapter = routes_map.bind("")
+        return adapter, requirements, len(pages)
+
+    def requirement(self, path: str) -> Optional[PageGroups]:
+        """Group requirement of the page at `path`, if any."""
+        adapter, requirements, n_pages = self._index
+        if n_pages != len(dash.page_registry):
+            self._index = adapter, requirements, n_pages = self._compile()
+        if adapter is None:
+            return None
+        try:
+            endpoint, _ = adapter.match(path)
+        except HTTPException:
+            return None
+        return requirements[endpoint]
+
+    def allows(self, path: str) -> bool:
+        """Whether the current user may access the page at `path`."""
+        requirement = self.requirement(path)
+        if requirement is None:
+            return True
+        return bool(check_groups(
+            requirement.groups, check_type=requirement.check_type
+        ))
@@ -0,0 +1,221 @@
+import cProfile
+import functools
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+from flask import has_request_context, request
+
+from .auth import Auth
+
+
+class AuthProfiler:
+    """Opt-in profiler of the authentication check and OIDC callback.
+
+    Every instrumented call is timed. Calls running for longer than
+    `threshold` seconds are sampled by a watchdog thread, which records
+    their stacks every `sample_interval` seconds, and their stack profile
+    is written in collapsed format (one "frame;frame;frame count" line per
+    stack, as read by flame graph tools). Besides, one call in
+    `sample_every` runs under cProfile, and its profile is written as a
+    `.prof` file (see `pstats`). Only the `max_files` most recent
+    profiles are kept.
+
+    Normal calls only pay for two clock reads and a dict update under a
+    lock. The watchdog sleeps while no call is running, and otherwise
+    until the oldest running call reaches `threshold`.
+
+    Usage:
+    >>> profiler = AuthProfiler("/tmp/dash-auth-profiles", threshold=0.5)
+    >>> profiler.instrument(auth)
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        threshold: float = 0.5,
+        sample_every: int = 0,
+        sample_interval: float = 0.005,
+        max_files: int = 100,
+    ):
+        """
+        :param directory: Directory of the profiles, created if needed
+        :param threshold: Duration in seconds above which a call's stacks
+            are sampled and written
+        :param sample_every: Run one call in `sample_every` under cProfile,
+            0 to disable
+        :param sample_interval: Interval in seconds between two stack
+            samples of a slow call
+        :param max_files: Number of profiles kept, the oldest are deleted
+        """
+        self.directory = directory
+        self.threshold = threshold
+        self.sample_every = sample_every
+        self.sample_interval = sample_interval
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+        self._counter = itertools.count(1)
+        # Running calls by thread id: (start, stacks counter), updated and
+        # sampled under `_sample_lock`
+        self._running: Dict[int, tuple] = {}
+        self._sample_lock = threading.Lock()
+        # Set while calls are running
+        self._active = threading.Event()
+        self._lock = threading.Lock()
+        self._watchdog: Optional[threading.Thread] = None
+        self._stats = Counter()
+
+    def instrument(self, auth: Auth):
+        """Profile the authentication check of `auth`, and its OIDC
+        callback if it is an `OIDCAuth`."""
+        hooks = auth.app.server.before_request_funcs.setdefault(None, [])
+        for i, hook in enumerate(hooks):
+            if hook is auth._before_request_auth:
+                hooks[i] = self.wrap(hook, "before_request_auth")
+        view_functions = auth.app.server.view_functions
+        if "oidc_callback" in view_functions:
+            view_functions["oidc_callback"] = self.wrap(
+                view_functions["oidc_callback"], "oidc_callback"
+            )
+
+    def wrap(self, func: Callable, name: str) -> Callable:
+        """Profile the calls to a function."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if self._watchdog is None:
+                self._start_watchdog()
+            n = next(self._counter)
+            profile = None
+            if self.sample_every and n % self.sample_every == 0:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Another profiler is active on this thread
+                    profile = None
+            thread_id = threading.get_ident()
+            stacks = Counter()
+            start = time.perf_counter()
+            with self._sample_lock:
+                self._running[thread_id] = (start, stacks)
+                self._active.set()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._sample_lock:
+                    self._running.pop(thread_id, None)
+                    # The watchdog no longer updates the stacks
+                    stacks = dict(stacks)
+                if profile is not None:
+                    profile.disable()
+                try:
+                    self._record(n, name, elapsed, profile, stacks)
+                except Exception:
+                    # Never fail the profiled call
+                    logging.exception("Could not record the auth profile.")
+
+        return wrapper
+
+    def _start_watchdog(self):
+        with self._lock:
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(
+                    target=self._sample_loop,
+                    name="dash-auth-profiler",
+                    daemon=True,
+                )
+                self._watchdog.start()
+
+    def _sample_loop(self):
+        while True:
+            self._active.wait()
+            with self._sample_lock:
+                if not self._running:
+                    self._active.clear()
+                    continue
+                now = time.perf_counter()
+                oldest = min(start for start, _ in self._running.values())
+                delay = oldest + self.threshold - now
+                if delay <= 0:
+                    frames = sys._current_frames()
+                    for thread_id, (start, stacks) in self._running.items():
+                        frame = frames.get(thread_id)
+                        if frame is not None and now - start >= self.threshold:
+                            stacks[self._collapse(frame)] += 1
+            # Sleep until the oldest call is slow, then between samples
+            time.sleep(max(delay, self.sample_interval))
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                f":{frame.f_lineno})"
+            )
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _record(self, n, name, elapsed, profile, stacks):
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["time"] += elapsed
+            if elapsed >= self.threshold:
+                self._stats["slow"] += 1
+        write_stacks = elapsed >= self.threshold and stacks
+        if profile is None and not write_stacks:
+            return
+        path = request.path if has_request_context() else ""
+        prefix = os.path.join(
+            self.directory,
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{n}"
+            f"-{name}-{elapsed * 1000:.0f}ms",
+        )
+        try:
+            if profile is not None:
+                profile.dump_stats(prefix + ".prof")
+                self._written()
+            if write_stacks:
+                with open(prefix + ".stacks", "w", encoding="utf-8") as f:
+                    f.write(f"# {name} {path} {elapsed:.3f}s\n")
+                    f.writelines(
+                        f"{stack} {count}\n" for stack, count in stacks.items()
+                    )
+                self._written()
+        except OSError:
+            logging.exception("Could not write the auth profile.")
+
+    def _written(self):
+        with self._lock:
+            self._stats["profiles"] += 1
+        self.rotate()
+
+    def rotate(self):
+        """Delete the oldest profiles above `max_files`."""
+        files = sorted(
+            (
+                entry for entry in os.scandir(self.directory)
+                if entry.is_file()
+                and entry.name.endswith((".prof", ".stacks"))
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, float]:
+        """Number of calls, slow calls and written profiles, and the total
+        time of the calls in seconds."""
+        with self._lock:
+            return dict(self._stats)
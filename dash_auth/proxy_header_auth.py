@@ -0,0 +1,104 @@
+import functools
+import ipaddress
+import logging
+from typing import List, Optional, Tuple
+
+import flask
+from dash import Dash
+
+from .auth import Auth
+from .group_protection import REQUEST_USER
+
+
+class ProxyHeaderAuth(Auth):
+    def __init__(
+        self,
+        app: Dash,
+        trusted_proxies: List[str],
+        user_header: str = "X-Forwarded-User",
+        groups_header: Optional[str] = "X-Forwarded-Groups",
+        groups_separator: str = ",",
+        public_routes: Optional[list] = None,
+    ):
+        """Trust the identity set by an authenticating reverse proxy
+        (e.g. oauth2-proxy, or an mTLS front-end) in request headers.
+
+        The headers are only trusted on requests coming from the
+        `trusted_proxies`, make sure the app cannot be reached without
+        going through them. Nothing is read from or written to the
+        session: the user and its groups are available for the current
+        request only, with `get_user`, `list_groups` and `check_groups`.
+
+        :param app: Dash app
+        :param trusted_proxies: list of the addresses or networks (CIDR
+            notation) of the proxies, e.g. ["10.0.0.0/8", "127.0.0.1"]
+        :param user_header: header holding the username
+        :param groups_header: header holding the user's groups, if any
+        :param groups_separator: separator of the groups in `groups_header`
+        :param public_routes: list of public routes, routes should follow the
+            Flask route syntax
+        """
+        super().__init__(app, public_routes=public_routes)
+        self.trusted_proxies = [
+            ipaddress.ip_network(proxy) for proxy in trusted_proxies
+        ]
+        self.user_header = user_header
+        self.groups_header = groups_header
+        self.groups_separator = groups_separator
+        self._user_environ_key = self._environ_key(user_header)
+        # Requests come from a few proxies and users have a few distinct
+        # group sets, so both checks are cached
+        self._trusted = functools.lru_cache(maxsize=1024)(self._is_trusted)
+        self._split_groups = functools.lru_cache(maxsize=4096)(
+            self._split_groups
+        )
+
+    @staticmethod
+    def _environ_key(header: str) -> str:
+        return "HTTP_" + header.upper().replace("-", "_")
+
+    def _is_trusted(self, remote_addr: Optional[str]) -> bool:
+        """Whether the address is one of the trusted proxies."""
+        if not remote_addr:
+            return False
+        try:
+            address = ipaddress.ip_address(remote_addr)
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_proxies)
+
+    def _split_groups(self, value: str) -> Tuple[str, ...]:
+        return tuple(
+            group.strip() for group in value.split(self.groups_separator)
+            if group.strip()
+        )
+
+    def rejects_environ(self, environ: dict) -> bool:
+        return not (
+            environ.get(self._user_environ_key)
+            and self._trusted(environ.get("REMOTE_ADDR"))
+        )
+
+    def is_authorized(self):
+        request = flask.request
+        username = request.headers.get(self.user_header)
+        if not username:
+            return False
+        if not self._trusted(request.remote_addr):
+            logging.warning(
+                "Ignoring %s header from untrusted address %s.",
+                self.user_header, request.remote_addr,
+            )
+            return False
+        groups = ()
+        if self.groups_header is not None:
+            groups = self._split_groups(
+                request.headers.get(self.groups_header, "")
+            )
+        setattr(
+            flask.g, REQUEST_USER, {"email": username, "groups": list(groups)}
+        )
+        return True
+
+    def login_request(self):
+        return flask.Response("Unauthorized", status=401)
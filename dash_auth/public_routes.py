@@ -1,5 +1,7 @@
 import inspect
 import os
+import threading
+from typing import FrozenSet, Iterable, NamedTuple, Tuple
 
 from dash import Dash, callback
 from dash._callback import GLOBAL_CALLBACK_MAP
@@ -23,6 +25,68 @@ BASE_PUBLIC_ROUTES = [
 ]
 PUBLIC_ROUTES = "PUBLIC_ROUTES"
 PUBLIC_CALLBACKS = "PUBLIC_CALLBACKS"
+PUBLIC_REGISTRY = "DASH_AUTH_PUBLIC_REGISTRY"
+
+
+class PublicSnapshot(NamedTuple):
+    """Immutable state of the public routes and callbacks."""
+
+    routes: MapAdapter
+    callbacks: FrozenSet[str]
+    version: int
+
+
+class PublicRegistry:
+    """Copy-on-write registry of the public routes and callbacks.
+
+    Each registration builds a new, fully compiled snapshot and publishes
+    it with a single attribute assignment. Readers use `snapshot` without
+    taking a lock, and never trigger a route map recompilation: a request
+    keeps using the snapshot it read even if routes are registered
+    concurrently (e.g. late registrations by Dash pages plugins).
+    """
+
+    def __init__(self, app: Dash):
+        self.app = app
+        self._lock = threading.Lock()
+        self._rules: Tuple[str, ...] = ()
+        self.snapshot = self._build((), frozenset(), 0)
+
+    @staticmethod
+    def _build(
+        rules: Tuple[str, ...], callbacks: FrozenSet[str], version: int
+    ) -> PublicSnapshot:
+        routes_map = Map([Rule(rule) for rule in rules])
+        # Compile the map now rather than on its first match
+        routes_map.update()
+        return PublicSnapshot(routes_map.bind(""), callbacks, version)
+
+    def _publish(self, rules: Tuple[str, ...], callbacks: FrozenSet[str]):
+        """Publish a new snapshot, the caller must hold the lock."""
+        snapshot = self._build(rules, callbacks, self.snapshot.version + 1)
+        self._rules = rules
+        self.snapshot = snapshot
+        # Kept in the server config for backwards compatibility
+        self.app.server.config[PUBLIC_ROUTES] = snapshot.routes
+        self.app.server.config[PUBLIC_CALLBACKS] = list(snapshot.callbacks)
+
+    def add_routes(self, routes: Iterable[str]):
+        with self._lock:
+            routes = list(routes)
+            if not self._rules:
+                routes = BASE_PUBLIC_ROUTES + routes
+            rules = self._rules + tuple(
+                dict.fromkeys(
+                    route for route in routes if route not in self._rules
+                )
+            )
+            self._publish(rules, self.snapshot.callbacks)
+
+    def add_callbacks(self, callback_ids: Iterable[str]):
+        with self._lock:
+            self._publish(
+                self._rules, self.snapshot.callbacks | set(callback_ids)
+            )
 
 
 def add_public_routes(app: Dash, routes: list):
@@ -47,15 +111,7 @@ def add_public_routes(app: Dash, routes: list):
     :param routes: list of public routes to be added
     """
 
-    public_routes = get_public_routes(app)
-
-    if not public_routes.map._rules:
-        routes = BASE_PUBLIC_ROUTES + routes
-
-    for route in routes:
-        public_routes.map.add(Rule(route))
-
-    app.server.config[PUBLIC_ROUTES] = public_routes
+    get_public_registry(app).add_routes(routes)
 
 
 def public_callback(*callback_args, **callback_kwargs):
@@ -79,9 +135,7 @@ def public_callback(*callback_args, **callback_kwargs):
         )
         try:
             app = get_app()
-            app.server.config[PUBLIC_CALLBACKS] = (
-                get_public_callbacks(app) + [callback_id]
-            )
+            get_public_registry(app).add_callbacks([callback_id])
         except Exception:
             print(
                 "Could not set up the public callback as the Dash object "
@@ -96,11 +150,21 @@ def public_callback(*callback_args, **callback_kwargs):
     return decorator
 
 
+def get_public_registry(app: Dash) -> PublicRegistry:
+    """Retrieve the public routes and callbacks registry."""
+    registry = app.server.config.get(PUBLIC_REGISTRY)
+    if registry is None:
+        registry = app.server.config.setdefault(
+            PUBLIC_REGISTRY, PublicRegistry(app)
+        )
+    return registry
+
+
 def get_public_routes(app: Dash) -> MapAdapter:
     """Retrieve the public routes."""
-    return app.server.config.get(PUBLIC_ROUTES, Map([]).bind(""))
+    return get_public_registry(app).snapshot.routes
 
 
-def get_public_callbacks(app: Dash) -> list:
+def get_public_callbacks(app: Dash) -> FrozenSet[str]:
     """Retrieve the public callbacks ids."""
-    return app.server.config.get(PUBLIC_CALLBACKS, [])
+    return get_public_registry(app).snapshot.callbacks
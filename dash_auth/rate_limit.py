@@ -0,0 +1,180 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from ._sqlite import SQLiteConnections
+
+
+class TokenBucketLimiter:
+    """In-process token bucket rate limiter of the failed login attempts.
+
+    Each key has a bucket of `burst` tokens, refilled at `rate` tokens per
+    second, and each failed attempt takes a token. Buckets are kept for at
+    most `max_keys` keys, the least recently used buckets are evicted first
+    (an evicted bucket is full again).
+
+    Attempts in flight are counted separately: an attempt only starts if
+    the bucket would still have a token were all the attempts in flight to
+    fail, otherwise it waits for them to finish. Concurrent attempts thus
+    cannot all be checked before the limit applies, while successful
+    attempts, concurrent or not, are never limited.
+    """
+
+    # Clock of the buckets' update times
+    _clock = staticmethod(time.monotonic)
+
+    def __init__(
+        self,
+        rate: float = 0.2,
+        burst: int = 10,
+        max_keys: int = 100000,
+        max_wait: float = 10,
+    ):
+        """
+        :param rate: Number of tokens added to each bucket per second
+        :param burst: Size of the buckets
+        :param max_keys: Maximum number of buckets kept in memory
+        :param max_wait: Maximum time in seconds an attempt waits for the
+            attempts in flight with the same key to finish
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.max_wait = max_wait
+        self._buckets = OrderedDict()
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+
+    def _tokens(self, tokens: float, updated_at: float, now: float) -> float:
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    def acquire(self, key: str) -> float:
+        """Start an attempt for the key, to be finished with `release`.
+
+        :return: 0 if the attempt started, otherwise the number of seconds
+            before it could start
+        """
+        deadline = time.monotonic() + self.max_wait
+        with self._finished:
+            while True:
+                tokens = self._available(key, self._clock())
+                in_flight = self._in_flight.get(key, 0)
+                if tokens - in_flight >= 1:
+                    self._in_flight[key] = in_flight + 1
+                    return 0
+                timeout = deadline - time.monotonic()
+                if not in_flight or timeout <= 0:
+                    return (in_flight + 1 - tokens) / self.rate
+                self._finished.wait(timeout)
+
+    def release(self, key: str, failed: bool = False):
+        """Finish an attempt started with `acquire`, taking a token from
+        the key's bucket if it failed."""
+        with self._finished:
+            in_flight = self._in_flight.pop(key) - 1
+            if in_flight:
+                self._in_flight[key] = in_flight
+            if failed:
+                self._charge(key, self._clock())
+            self._finished.notify_all()
+
+    def _available(self, key: str, now: float) -> float:
+        """Number of tokens in the key's bucket."""
+        bucket = self._buckets.get(key)
+        return self.burst if bucket is None else self._tokens(*bucket, now)
+
+    def _charge(self, key: str, now: float):
+        """Take a token from the key's bucket."""
+        bucket = self._buckets.pop(key, None)
+        tokens = self.burst if bucket is None else self._tokens(*bucket, now)
+        self._buckets[key] = (tokens - 1, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+
+class SQLiteTokenBucketLimiter(TokenBucketLimiter):
+    """Token bucket rate limiter shared between workers through a SQLite
+    database file.
+
+    Failures are charged atomically between workers, while the attempts
+    in flight are counted by each worker: concurrent attempts spread over
+    several workers can check up to `burst` credentials per worker before
+    the limit applies.
+    """
+
+    _clock = staticmethod(time.time)
+
+    def __init__(
+        self,
+        path: str,
+        rate: float = 0.2,
+        burst: int = 10,
+        prune_every: int = 1000,
+        max_wait: float = 10,
+    ):
+        """
+        :param path: Path of the SQLite database file
+        :param rate: Number of tokens added to each bucket per second
+        :param burst: Size of the buckets
+        :param prune_every: Delete the full buckets from the database
+            every `prune_every` consumed tokens
+        :param max_wait: Maximum time in seconds an attempt waits for the
+            attempts in flight with the same key to finish
+        """
+        super().__init__(rate=rate, burst=burst, max_wait=max_wait)
+        self.path = path
+        self.prune_every = prune_every
+        self._consumed = 0
+        self._connection = SQLiteConnections(path)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets ("
+                "key TEXT PRIMARY KEY, "
+                "tokens REAL NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+
+    def _available(self, key: str, now: float) -> float:
+        bucket = self._connection().execute(
+            "SELECT tokens, updated_at FROM token_buckets WHERE key = ?",
+            (key,),
+        ).fetchone()
+        return self.burst if bucket is None else self._tokens(*bucket, now)
+
+    def _charge(self, key: str, now: float):
+        conn = self._connection()
+        # Lock the database for writing before reading the bucket, so that
+        # concurrent failures of all the workers are all charged
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            bucket = conn.execute(
+                "SELECT tokens, updated_at FROM token_buckets WHERE key = ?",
+                (key,),
+            ).fetchone()
+            tokens = self.burst if bucket is None else self._tokens(
+                *bucket, now
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO token_buckets "
+                "(key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens - 1, now),
+            )
+            self._prune(conn, now)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        # Called by `_charge`, under the lock
+        self._consumed += 1
+        if self._consumed % self.prune_every == 0:
+            # Buckets refilled since are full, i.e. the same as no bucket
+            conn.execute(
+                "DELETE FROM token_buckets WHERE updated_at < ?",
+                (now - (self.burst + 1) / self.rate,),
+            )
@@ -0,0 +1,155 @@
+import hashlib
+import math
+import threading
+import time
+from typing import Optional
+
+from ._sqlite import SQLiteConnections
+
+
+class BloomFilter:
+    """Compact probabilistic set membership.
+
+    Membership tests never return false negatives, and return false
+    positives with a probability of about `error_rate` while the number of
+    items added stays under `capacity`.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = int(
+            -self.capacity * math.log(error_rate) / math.log(2) ** 2
+        ) + 1
+        self.num_hashes = max(
+            int(round(self.size / self.capacity * math.log(2))), 1
+        )
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(item)
+        )
+
+
+class RevocationList:
+    """List of revoked session ids, shared between workers.
+
+    Revoked ids are persisted in a SQLite database file that all the
+    workers of a host (or a shared volume) use. Each worker keeps a Bloom
+    filter of the revoked ids, synced incrementally from the database at
+    most every `sync_interval` seconds, so checking a valid session costs
+    a few hashes and only (rare) Bloom filter hits query the database.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sync_interval: float = 1.0,
+        capacity: int = 100000,
+        error_rate: float = 0.001,
+    ):
+        """
+        :param path: Path of the SQLite database file
+        :param sync_interval: Minimum interval in seconds between syncs with
+            the database, i.e. the maximum delay for a revocation made by
+            another worker to be effective
+        :param capacity: Initial capacity of the Bloom filter, it is rebuilt
+            with twice the capacity when full
+        :param error_rate: Target false positive rate of the Bloom filter
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self.error_rate = error_rate
+        self._connection = SQLiteConnections(path)
+        self._sync_lock = threading.Lock()
+        self._last_id = 0
+        self._last_sync = 0.0
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS revoked_sessions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "sid TEXT NOT NULL UNIQUE, "
+                "revoked_at REAL NOT NULL)"
+            )
+        self._bloom = BloomFilter(capacity, error_rate)
+        self.sync()
+
+    def revoke(self, *sids: str):
+        """Revoke session ids."""
+        now = time.time()
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO revoked_sessions (sid, revoked_at) "
+                "VALUES (?, ?)",
+                [(sid, now) for sid in sids],
+            )
+        self.sync()
+
+    def _rebuild(self, capacity: int):
+        bloom = BloomFilter(capacity, self.error_rate)
+        for (sid,) in self._connection().execute(
+            "SELECT sid FROM revoked_sessions WHERE id <= ?", (self._last_id,)
+        ):
+            bloom.add(sid)
+        # Readers switch to the new filter atomically
+        self._bloom = bloom
+
+    def sync(self, blocking: bool = True):
+        """Load the ids revoked since the last sync.
+
+        :param blocking: Whether to wait for a sync in progress in another
+            thread, otherwise skip the sync
+        """
+        if not self._sync_lock.acquire(blocking):
+            return
+        try:
+            rows = self._connection().execute(
+                "SELECT id, sid FROM revoked_sessions WHERE id > ? "
+                "ORDER BY id",
+                (self._last_id,),
+            ).fetchall()
+            if rows:
+                self._last_id = rows[-1][0]
+                capacity = self._bloom.capacity
+                while self._bloom.count + len(rows) > capacity:
+                    capacity *= 2
+                if capacity > self._bloom.capacity:
+                    self._rebuild(capacity)
+                else:
+                    for _, sid in rows:
+                        self._bloom.add(sid)
+            self._last_sync = time.monotonic()
+        finally:
+            self._sync_lock.release()
+
+    def is_revoked(self, sid: Optional[str]) -> bool:
+        """Check whether a session id is revoked."""
+        if not sid:
+            return False
+        if time.monotonic() - self._last_sync > self.sync_interval:
+            self.sync(blocking=False)
+        if sid not in self._bloom:
+            return False
+        # Confirm Bloom filter hits, which may be false positives
+        return self._connection().execute(
+            "SELECT 1 FROM revoked_sessions WHERE sid = ?", (sid,)
+        ).fetchone() is not None
+
+    def __contains__(self, sid: str) -> bool:
+        return self.is_revoked(sid)
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Tuple, Union
+
+# File locks are POSIX only, elsewhere only threads are synchronized
+try:
+    import fcntl
+except ModuleNotFoundError:  # pragma: no cover
+    fcntl = None
+
+Key = Union[str, bytes, Tuple[str, ...]]
+
+MAGIC = b"DAC2"
+# magic, number of slots, slot size
+HEADER = struct.Struct("<4sII")
+HEADER_SIZE = 64
+# crc32, value length, expiry (epoch seconds), key digest
+SLOT_HEADER = struct.Struct("<IHxxd16s")
+
+
+class SharedMemoryCache:
+    """Cache shared by all the worker processes of a host through a
+    memory-mapped file, e.g. on `/dev/shm`.
+
+    The file holds a hash table of `slots` fixed-size slots. Each key is
+    hashed to a slot, and up to `probes` consecutive slots are tried;
+    when they are all taken, the entry expiring first is overwritten.
+    Values are JSON-serializable and must fit in a slot once serialized
+    (`slot_size - 32` bytes), larger values are not cached.
+
+    Reads do not take any lock: each slot carries a checksum, and a slot
+    read while being written is treated as a miss. Writes are serialized
+    between processes with a lock on the file.
+
+    Keys are stored as BLAKE2 digests keyed with `hash_key`, by default
+    the Flask secret key of the app using the cache. The hash key is never
+    stored in the file, so that the credentials used as keys cannot be
+    brute-forced from the file alone; they can by anyone who also knows
+    the hash key.
+
+    Usage:
+    >>> cache = SharedMemoryCache("/dev/shm/dash-auth.cache", ttl=300)
+    >>> BasicAuth(
+    ...     app, auth_func=check_ldap, secret_key=secret, shared_cache=cache
+    ... )
+    """
+
+    def __init__(
+        self,
+        path: str,
+        slots: int = 65536,
+        slot_size: int = 256,
+        ttl: float = 300,
+        probes: int = 8,
+        hash_key: Optional[Union[str, bytes]] = None,
+    ):
+        """
+        :param path: Path of the cache file, created if needed. All the
+            workers sharing the cache must use the same path and layout
+            (`slots` and `slot_size`), a file with another layout is
+            reset.
+        :param slots: Number of slots of the hash table
+        :param slot_size: Size of the slots in bytes
+        :param ttl: Default time to live of the entries in seconds
+        :param probes: Number of slots tried for each key
+        :param hash_key: Secret keying the digests of the keys, shared by
+            all the workers. By default, `BasicAuth` uses the app's Flask
+            secret key.
+        """
+        if slot_size <= SLOT_HEADER.size:
+            raise ValueError(
+                f"slot_size must be greater than {SLOT_HEADER.size}."
+            )
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ttl = ttl
+        self.probes = min(probes, slots)
+        self.hits = 0
+        self.misses = 0
+        self._hash_key = None
+        if hash_key is not None:
+            self.set_hash_key(hash_key)
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = HEADER_SIZE + slots * slot_size
+        with self._file_lock():
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            header = os.read(self._fd, HEADER.size)
+            if (
+                len(header) < HEADER.size
+                or os.fstat(self._fd).st_size != size
+                or HEADER.unpack(header) != (MAGIC, slots, slot_size)
+            ):
+                os.ftruncate(self._fd, size)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, HEADER.pack(MAGIC, slots, slot_size))
+        self._mmap = mmap.mmap(self._fd, size)
+        if header[:HEADER.size] != HEADER.pack(MAGIC, slots, slot_size):
+            # Entries of another layout would only be misses
+            self.clear()
+
+    def _file_lock(self):
+        return _FileLock(self._fd, self._lock)
+
+    @property
+    def has_hash_key(self) -> bool:
+        """Whether the hash key of the cache is set."""
+        return self._hash_key is not None
+
+    def set_hash_key(self, hash_key: Union[str, bytes]):
+        """Set the secret keying the digests of the keys."""
+        if isinstance(hash_key, str):
+            hash_key = hash_key.encode()
+        if not hash_key:
+            raise ValueError("The hash key of the cache cannot be empty.")
+        self._hash_key = hashlib.blake2b(
+            hash_key, digest_size=32, person=b"dash-auth-cache"
+        ).digest()
+
+    def _digest(self, key: Key) -> bytes:
+        if self._hash_key is None:
+            raise RuntimeError(
+                "SharedMemoryCache has no hash key, pass a `hash_key` or "
+                "use it with an app having a secret key."
+            )
+        if isinstance(key, tuple):
+            key = "\0".join(key)
+        if isinstance(key, str):
+            key = key.encode()
+        return hashlib.blake2b(
+            key, key=self._hash_key, digest_size=16
+        ).digest()
+
+    def _offsets(self, digest: bytes):
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        for i in range(self.probes):
+            yield HEADER_SIZE + (start + i) % self.slots * self.slot_size
+
+    def _read(self, offset: int):
+        """Key digest, expiry and value of a slot, None if the slot is
+        empty or being written."""
+        slot = self._mmap[offset:offset + self.slot_size]
+        crc, length, expires_at, digest = SLOT_HEADER.unpack_from(slot)
+        end = SLOT_HEADER.size + length
+        if end > self.slot_size or crc != zlib.crc32(slot[4:end]):
+            return None
+        return digest, expires_at, slot[SLOT_HEADER.size:end]
+
+    def get(self, key: Key, default: Any = None) -> Any:
+        digest = self._digest(key)
+        now = time.time()
+        for offset in self._offsets(digest):
+            entry = self._read(offset)
+            if entry is not None and entry[0] == digest:
+                if entry[1] > now:
+                    self.hits += 1
+                    return json.loads(entry[2])
+                break
+        self.misses += 1
+        return default
+
+    def set(self, key: Key, value: Any, ttl: float = None):
+        data = json.dumps(value, separators=(",", ":")).encode()
+        if SLOT_HEADER.size + len(data) > self.slot_size:
+            return
+        digest = self._digest(key)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        slot = SLOT_HEADER.pack(0, len(data), expires_at, digest) + data
+        slot = struct.pack("<I", zlib.crc32(slot[4:])) + slot[4:]
+        with self._file_lock():
+            offset = self._victim(digest)
+            self._mmap[offset:offset + len(slot)] = slot
+
+    def _victim(self, digest: bytes) -> int:
+        """Offset of the slot to write the key to: its current slot, else
+        an empty slot, else the slot expiring first."""
+        victim, victim_expires_at = None, None
+        for offset in self._offsets(digest):
+            entry = self._read(offset)
+            if entry is None:
+                expires_at = float("-inf")
+            elif entry[0] == digest:
+                return offset
+            else:
+                expires_at = entry[1]
+            if victim is None or expires_at < victim_expires_at:
+                victim, victim_expires_at = offset, expires_at
+        return victim
+
+    def delete(self, key: Key):
+        digest = self._digest(key)
+        with self._file_lock():
+            for offset in self._offsets(digest):
+                entry = self._read(offset)
+                if entry is not None and entry[0] == digest:
+                    self._mmap[offset:offset + 4] = b"\xff" * 4
+
+    def clear(self):
+        with self._file_lock():
+            for i in range(self.slots):
+                offset = HEADER_SIZE + i * self.slot_size
+                self._mmap[offset:offset + SLOT_HEADER.size] = bytes(
+                    SLOT_HEADER.size
+                )
+
+    def __contains__(self, key: Key) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def __bool__(self) -> bool:
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Number of cache hits and misses in this process."""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+
+
+class _FileLock:
+    """Exclusive lock on a file between processes and threads."""
+
+    def __init__(self, fd: int, lock: threading.Lock):
+        self.fd = fd
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        self.lock.release()
@@ -0,0 +1,19 @@
+import base64
+
+import pytest
+
+from benchmarks.oidc_provider import FakeOIDCProvider
+
+
+@pytest.fixture
+def oidc_provider():
+    """Local OpenID Connect provider issuing real signed tokens."""
+    provider = FakeOIDCProvider().start()
+    yield provider
+    provider.stop()
+
+
+def basic_auth_header(username, password):
+    """Headers of a request with Basic credentials."""
+    credentials = base64.b64encode(f"{username}:{password}".encode())
+    return {"Authorization": f"Basic {credentials.decode()}"}
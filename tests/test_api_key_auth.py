@@ -0,0 +1,71 @@
+import pytest
+from dash import Dash, html
+from flask import jsonify
+
+from dash_auth import APIKeyAuth, hash_api_key, list_groups
+
+
+def create_app(**kwargs):
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    app.server.secret_key = "Test"
+
+    @app.server.route("/groups")
+    def groups():
+        return jsonify(list_groups())
+
+    APIKeyAuth(app, **kwargs)
+    return app
+
+
+def test_ak001_api_key_auth():
+    app = create_app(
+        api_keys={"bot": hash_api_key("secret"), "etl": hash_api_key("etl")},
+        key_groups={"bot": ["admin"]},
+    )
+    client = app.server.test_client()
+
+    assert client.get("/").status_code == 401
+    assert client.get("/", headers={"X-API-Key": "wrong"}).status_code == 401
+    resp = client.get("/groups", headers={"X-API-Key": "secret"})
+    assert resp.status_code == 200
+    assert resp.json == ["admin"]
+    assert client.get("/groups", headers={"X-API-Key": "etl"}).json == []
+    # The session is never used
+    assert "Set-Cookie" not in resp.headers
+
+
+def test_ak002_api_key_auth_file(tmp_path):
+    keys = tmp_path / "keys"
+    keys.write_text(
+        "# name:sha256:groups\n"
+        f"bot:{hash_api_key('secret')}:admin,editors\n"
+    )
+    app = create_app(
+        api_keys=str(keys), header="Authorization-Key", check_interval=0
+    )
+    client = app.server.test_client()
+
+    resp = client.get("/groups", headers={"Authorization-Key": "secret"})
+    assert resp.json == ["admin", "editors"]
+
+    keys.write_text(f"etl:{hash_api_key('etl')}\n")
+    assert client.get(
+        "/groups", headers={"Authorization-Key": "secret"}
+    ).status_code == 401
+    assert client.get(
+        "/groups", headers={"Authorization-Key": "etl"}
+    ).json == []
+
+    # A deleted or malformed file keeps the last keys
+    keys.unlink()
+    assert client.get(
+        "/groups", headers={"Authorization-Key": "etl"}
+    ).status_code == 200
+    keys.write_text("bot:not-hex\n")
+    assert client.get(
+        "/groups", headers={"Authorization-Key": "etl"}
+    ).status_code == 200
+
+    with pytest.raises(ValueError):
+        create_app(api_keys=str(tmp_path / "missing"))
@@ -0,0 +1,110 @@
+import json
+import sqlite3
+import threading
+
+from dash import Dash, html
+
+from dash_auth import AuditLog, BasicAuth, SQLiteAuditSink
+
+from .conftest import basic_auth_header
+
+
+def test_au001_audit_basic_auth(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    BasicAuth(app, {"hello": "world"}, secret_key="Test")
+    audit_log = AuditLog(str(path), flush_interval=0.05).init_app(app)
+
+    client = app.server.test_client()
+    for _ in range(2):
+        assert client.get(
+            "/", headers=basic_auth_header("hello", "world")
+        ).status_code == 200
+    assert client.get(
+        "/", headers=basic_auth_header("hello", "there")
+    ).status_code == 401
+    assert audit_log.flush()
+
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    # A single sign-in for the session, then a failed login
+    assert [(e["event"], e.get("user")) for e in events] == [
+        ("signin", "hello"),
+        ("login_failed", "hello"),
+        ("denied", None),
+    ]
+    assert events[-1]["auth"] == "BasicAuth"
+    assert events[-1]["path"] == "/"
+    assert audit_log.stats()["written"] == 3
+    audit_log.close()
+
+
+def test_au002_audit_drop_policies(tmp_path):
+    release = threading.Event()
+
+    class SlowSink:
+        def __init__(self):
+            self.events = []
+
+        def write(self, events):
+            release.wait()
+            self.events.extend(events)
+
+        def close(self):
+            pass
+
+    for policy, written in [
+        ("drop_new", [0, 1, 2]), ("drop_oldest", [0, 8, 9])
+    ]:
+        release.clear()
+        sink = SlowSink()
+        audit_log = AuditLog(
+            sink,
+            max_queue_size=2,
+            batch_size=1,
+            flush_interval=0.05,
+            policy=policy,
+        )
+        audit_log.emit("event", n=0)
+        # Wait for the writer to block on the first event
+        while audit_log.stats()["queued"]:
+            pass
+        for n in range(1, 10):
+            audit_log.emit("event", n=n)
+        assert audit_log.stats()["dropped"] == 7
+        release.set()
+        assert audit_log.flush()
+        assert [e["n"] for e in sink.events] == written
+        audit_log.close()
+
+    sink = SQLiteAuditSink(str(tmp_path / "audit.db"))
+    audit_log = AuditLog(sink, flush_interval=0.05)
+    for n in range(5):
+        audit_log.emit("signin", user=f"user{n}")
+    audit_log.close()
+    with sqlite3.connect(tmp_path / "audit.db") as conn:
+        assert conn.execute(
+            "SELECT COUNT(*) FROM audit_events WHERE event = 'signin'"
+        ).fetchone() == (5,)
+
+
+def test_au003_audit_basic_auth_without_session(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    # Without a secret key, the user cannot be saved in the session
+    BasicAuth(app, {"hello": "world"})
+    audit_log = AuditLog(str(path), flush_interval=0.05).init_app(app)
+
+    client = app.server.test_client()
+    for _ in range(5):
+        assert client.get(
+            "/", headers=basic_auth_header("hello", "world")
+        ).status_code == 200
+    assert audit_log.flush()
+    # A single sign-in is logged, not one per request
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(e["event"], e.get("user")) for e in events] == [
+        ("signin", "hello")
+    ]
+    audit_log.close()
@@ -0,0 +1,304 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from dash import Dash, html
+from werkzeug.security import generate_password_hash
+
+from dash_auth import (
+    BasicAuth,
+    CircuitBreaker,
+    HtpasswdFile,
+    SQLiteTokenBucketLimiter,
+    TokenBucketLimiter,
+)
+
+from .conftest import basic_auth_header
+
+
+def create_app(**kwargs):
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    BasicAuth(app, **kwargs)
+    return app
+
+
+def test_ba004_basic_auth_rate_limit():
+    calls = []
+
+    def auth_func(username, password):
+        calls.append(username)
+        return (username, password) in [("hello", "world"), ("hi", "there")]
+
+    app = create_app(
+        auth_func=auth_func,
+        rate_limiter=TokenBucketLimiter(rate=0.001, burst=3),
+    )
+    client = app.server.test_client()
+
+    # Successful logins are not limited
+    for _ in range(5):
+        assert client.get(
+            "/", headers=basic_auth_header("hello", "world")
+        ).status_code == 200
+
+    for _ in range(3):
+        assert client.get(
+            "/", headers=basic_auth_header("hello", "password")
+        ).status_code == 401
+    assert len(calls) == 8
+
+    # Limited by username and by IP, without checking the credentials
+    for username, password in [("hello", "world"), ("hi", "there")]:
+        resp = client.get("/", headers=basic_auth_header(username, password))
+        assert resp.status_code == 429
+        assert int(resp.headers["Retry-After"]) > 0
+    assert len(calls) == 8
+
+    other_ip = {"REMOTE_ADDR": "10.0.0.2"}
+    assert client.get(
+        "/", headers=basic_auth_header("hi", "there"), environ_base=other_ip
+    ).status_code == 200
+    assert client.get(
+        "/", headers=basic_auth_header("hello", "world"), environ_base=other_ip
+    ).status_code == 429
+
+
+def test_ba005_basic_auth_shared_rate_limit(tmp_path):
+    path = str(tmp_path / "limits.db")
+    workers = [
+        create_app(
+            username_password_list={"hello": "world"},
+            rate_limiter=SQLiteTokenBucketLimiter(path, rate=0.001, burst=2),
+            rate_limit_status=401,
+        ).server.test_client()
+        for _ in range(2)
+    ]
+    bad_credentials = basic_auth_header("hello", "password")
+    assert workers[0].get("/", headers=bad_credentials).status_code == 401
+    assert workers[1].get("/", headers=bad_credentials).status_code == 401
+    for worker in workers:
+        resp = worker.get("/", headers=basic_auth_header("hello", "world"))
+        assert resp.status_code == 401
+        assert "WWW-Authenticate" in resp.headers
+
+    # Forked workers open their own connection
+    limiter = SQLiteTokenBucketLimiter(path, rate=0.001, burst=2)
+    parent_conn = limiter._connection()
+
+    def worker():
+        assert limiter._connection() is not parent_conn
+        assert limiter.acquire("user:hello") > 0
+
+    process = multiprocessing.get_context("fork").Process(target=worker)
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+
+def test_ba006_basic_auth_callback_timeout_and_breaker():
+    backend = {"delay": 0}
+    transitions = []
+
+    def auth_func(username, password):
+        time.sleep(backend["delay"])
+        return (username, password) == ("hello", "world")
+
+    def user_groups(username):
+        time.sleep(backend["delay"])
+        return ["admin"]
+
+    breaker = CircuitBreaker(
+        failure_threshold=2,
+        recovery_timeout=0.3,
+        on_state_change=lambda *args: transitions.append(args[1:]),
+    )
+    app = create_app(
+        auth_func=auth_func,
+        user_groups=user_groups,
+        secret_key="Test",
+        callback_timeout=0.1,
+        circuit_breaker=breaker,
+    )
+    client = app.server.test_client()
+    valid, other = basic_auth_header("hello", "world"), basic_auth_header(
+        "hi", "there"
+    )
+    assert client.get("/", headers=valid).status_code == 200
+
+    # The backend hangs: the last verdict is used, unknown ones are denied
+    backend["delay"] = 1
+    start = time.perf_counter()
+    assert client.get("/", headers=valid).status_code == 200
+    assert client.get("/", headers=other).status_code == 401
+    assert transitions == [("closed", "open")]
+
+    # While the circuit is open, calls fail fast
+    assert client.get("/", headers=other).status_code == 401
+    assert client.get("/", headers=valid).status_code == 200
+    assert time.perf_counter() - start < 1
+    assert breaker.stats()["rejected"] == 4
+
+    # Recovery
+    backend["delay"] = 0
+    time.sleep(0.3)
+    assert client.get("/", headers=valid).status_code == 200
+    assert transitions[1:] == [("open", "half_open"), ("half_open", "closed")]
+    assert breaker.stats()["trips"] == 1
+    assert breaker.stats()["recoveries"] == 1
+
+
+def test_ba007_basic_auth_async_callbacks():
+    calls = []
+    loops = set()
+
+    async def auth_func(username, password):
+        calls.append(username)
+        loops.add(asyncio.get_running_loop())
+        await asyncio.sleep(0.2)
+        return (username, password) == ("hello", "world")
+
+    async def user_groups(username):
+        loops.add(asyncio.get_running_loop())
+        return ["admin"]
+
+    app = create_app(
+        auth_func=auth_func, user_groups=user_groups, secret_key="Test"
+    )
+
+    def call(headers):
+        client = app.server.test_client()
+        resp = client.get("/", headers=headers)
+        with client.session_transaction() as session:
+            return resp.status_code, session.get("user")
+
+    # Concurrent verifications of the same credentials are coalesced
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(
+            call, [basic_auth_header("hello", "world")] * 8
+        ))
+    assert results == [
+        (200, {"email": "hello", "groups": ["admin"]})
+    ] * 8
+    assert calls == ["hello"]
+
+    assert call(basic_auth_header("hello", "password")) == (401, None)
+    assert calls == ["hello", "hello"]
+    # All the calls ran on the same event loop
+    assert len(loops) == 1
+
+
+def test_ba008_basic_auth_htpasswd_file(tmp_path):
+    users = tmp_path / ".htpasswd"
+    groups = tmp_path / ".htgroups"
+    hello_hash = generate_password_hash("world", "pbkdf2:sha256:1000")
+    users.write_text(
+        "# comment\n"
+        f"hello:{hello_hash}\n"
+        # htpasswd -s hi there
+        "hi:{SHA}SQUo823r98Fc6l6anR6gJM9rKSE=\n"
+    )
+    groups.write_text("admin: hello\nviewers: hello hi\n")
+    htpasswd = HtpasswdFile(str(users), str(groups), check_interval=60)
+    app = create_app(
+        auth_func=htpasswd.check_password,
+        user_groups=htpasswd.get_groups,
+        secret_key="Test",
+    )
+
+    def call(username, password):
+        client = app.server.test_client()
+        resp = client.get("/", headers=basic_auth_header(username, password))
+        with client.session_transaction() as session:
+            return resp.status_code, session.get("user")
+
+    assert call("hello", "world") == (
+        200, {"email": "hello", "groups": ["admin", "viewers"]}
+    )
+    assert call("hi", "there") == (
+        200, {"email": "hi", "groups": ["viewers"]}
+    )
+    assert call("hello", "there") == (401, None)
+    assert call("unknown", "world") == (401, None)
+
+    # Changes are picked up once the check interval has elapsed
+    users.write_text(f"hello:{hello_hash}\n")
+    groups.write_text("viewers: hello\n")
+    stat = os.stat(users)
+    os.utime(users, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert call("hi", "there")[0] == 200
+    htpasswd.check_interval = 0
+    assert call("hi", "there") == (401, None)
+    assert call("hello", "world") == (
+        200, {"email": "hello", "groups": ["viewers"]}
+    )
+
+    # Deleted files keep their last content
+    users.unlink()
+    groups.unlink()
+    assert call("hello", "world") == (
+        200, {"email": "hello", "groups": ["viewers"]}
+    )
+    users.write_text(f"hello:{hello_hash}\n")
+
+    # Mistyped paths are errors, not empty files
+    with pytest.raises(ValueError):
+        HtpasswdFile(str(tmp_path / ".htpassword"))
+    with pytest.raises(ValueError):
+        HtpasswdFile(str(users), str(tmp_path / ".htgroup"))
+    assert len(htpasswd) == 1
+
+
+def test_ba009_basic_auth_concurrent_rate_limit(tmp_path):
+    for limiter in [
+        TokenBucketLimiter(rate=0.01, burst=3),
+        SQLiteTokenBucketLimiter(
+            str(tmp_path / "limits.db"), rate=0.01, burst=3
+        ),
+    ]:
+        calls = []
+
+        def auth_func(username, password):
+            calls.append(username)
+            time.sleep(0.3)
+            return False
+
+        app = create_app(auth_func=auth_func, rate_limiter=limiter)
+
+        def login(_):
+            return app.server.test_client().get(
+                "/", headers=basic_auth_header("hello", "password")
+            ).status_code
+
+        # Concurrent attempts cannot all pass the limit before it applies
+        with ThreadPoolExecutor(50) as executor:
+            statuses = list(executor.map(login, range(50)))
+        assert len(calls) == 3
+        assert sorted(set(statuses)) == [401, 429]
+
+
+def test_ba010_basic_auth_concurrent_successful_logins(tmp_path):
+    for limiter in [
+        TokenBucketLimiter(rate=0.2, burst=10),
+        SQLiteTokenBucketLimiter(
+            str(tmp_path / "limits.db"), rate=0.2, burst=10
+        ),
+    ]:
+        def auth_func(username, password):
+            time.sleep(0.3)
+            return (username, password) == ("hello", "world")
+
+        app = create_app(auth_func=auth_func, rate_limiter=limiter)
+
+        def login(_):
+            return app.server.test_client().get(
+                "/", headers=basic_auth_header("hello", "world")
+            ).status_code
+
+        # More concurrent logins than the burst, e.g. a page's callbacks
+        with ThreadPoolExecutor(20) as executor:
+            statuses = list(executor.map(login, range(20)))
+        assert statuses == [200] * 20
@@ -0,0 +1,19 @@
+from benchmarks.auth_scaling import scaling
+
+
+def test_bm001_auth_scaling_benchmark():
+    reports = scaling(
+        ["basic", "oidc"], threads=[1, 2], processes=[1, 2], requests=40
+    )
+    assert [
+        (report["auth"], report["processes"], report["threads"])
+        for report in reports
+    ] == [
+        (auth, processes, threads)
+        for auth in ["basic", "oidc"]
+        for processes in [1, 2]
+        for threads in [1, 2]
+    ]
+    assert all(report["requests"] == 40 for report in reports)
+    assert all(report["requests_per_sec"] > 0 for report in reports)
+    assert reports[0]["efficiency"] == 1
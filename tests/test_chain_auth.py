@@ -0,0 +1,37 @@
+from dash import Dash, html
+
+from dash_auth import APIKeyAuth, BasicAuth, ChainAuth, hash_api_key
+
+from .conftest import basic_auth_header
+
+
+def test_ca001_chain_auth():
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    api_key_auth = APIKeyAuth(app, api_keys={"bot": hash_api_key("secret")})
+    basic_auth = BasicAuth(app, {"hello": "world"})
+    chain = ChainAuth(
+        app, [api_key_auth, basic_auth], login_strategy=basic_auth
+    )
+    hooks = [
+        hook for hook in app.server.before_request_funcs[None]
+        if hook.__name__ == "before_request_auth"
+    ]
+    assert hooks == [chain._before_request_auth]
+
+    client = app.server.test_client()
+    assert client.get("/", headers={"X-API-Key": "secret"}).status_code == 200
+    assert client.get(
+        "/", headers=basic_auth_header("hello", "world")
+    ).status_code == 200
+    resp = client.get("/", headers={"Authorization": "Bearer token"})
+    assert resp.status_code == 401
+    assert resp.headers["WWW-Authenticate"].startswith("Basic")
+
+    stats = chain.stats()
+    assert list(stats) == ["APIKeyAuth", "BasicAuth"]
+    assert stats["APIKeyAuth"]["attempts"] == 3
+    assert stats["APIKeyAuth"]["hits"] == 1
+    assert stats["BasicAuth"]["attempts"] == 2
+    assert stats["BasicAuth"]["hit_rate"] == 0.5
+    assert stats["BasicAuth"]["mean_latency"] > 0
@@ -1,6 +1,12 @@
-from dash_auth import list_groups, check_groups, protected
+import dash
+from dash import Dash, html
+from dash_auth import (
+    BasicAuth, LayoutCache, list_groups, check_groups, protected
+)
 from flask import Flask, session
 
+from .conftest import basic_auth_header
+
 
 def test_gp001_list_groups():
     app = Flask(__name__)
@@ -50,3 +56,116 @@ def test_gp003_protected():
 
         del session["user"]
         assert f1() == "unauthenticated"
+
+
+def test_gp004_page_groups():
+    app = Dash(__name__, use_pages=True, pages_folder="")
+    BasicAuth(
+        app,
+        {"admin": "pwd", "viewer": "pwd"},
+        user_groups={"admin": ["admin"], "viewer": ["viewers"]},
+        secret_key="Test!",
+    )
+    pages = {
+        "gp004_home": dict(path="/"),
+        "gp004_admin": dict(path="/admin", groups=["admin"]),
+        "gp004_report": dict(
+            path_template="/report/<report_id>",
+            groups=["admin", "viewers"],
+            groups_check_type="all_of",
+        ),
+    }
+    try:
+        for module, kwargs in pages.items():
+            dash.register_page(module, layout=html.Div(module), **kwargs)
+        client = app.server.test_client()
+
+        def routing_callback(username, pathname):
+            location = {"id": "_pages_location"}
+            return client.post(
+                "/_dash-update-component",
+                json={
+                    "output": (
+                        ".._pages_content.children..._pages_store.data.."
+                    ),
+                    "outputs": [
+                        {"id": "_pages_content", "property": "children"},
+                        {"id": "_pages_store", "property": "data"},
+                    ],
+                    "inputs": [
+                        dict(location, property="pathname", value=pathname),
+                        dict(location, property="search", value=""),
+                    ],
+                    "changedPropIds": ["_pages_location.pathname"],
+                    "state": [],
+                },
+                headers=basic_auth_header(username, "pwd"),
+            ).status_code
+
+        def get(username, path):
+            return client.get(
+                path, headers=basic_auth_header(username, "pwd")
+            ).status_code
+
+        assert get("viewer", "/") == 200
+        assert get("admin", "/admin") == 200
+        assert get("viewer", "/admin") == 403
+        assert get("admin", "/report/1") == 403
+        assert routing_callback("viewer", "/admin") == 403
+        assert routing_callback("admin", "/admin") == 200
+        assert routing_callback("admin", "/report/1") == 403
+    finally:
+        for module in pages:
+            dash.page_registry.pop(module, None)
+
+
+def test_gp005_layout_cache():
+    builds = []
+
+    def layout():
+        builds.append(list_groups())
+        return protected(
+            html.Div("Please log in"),
+            missing_permissions_output=html.Div("Viewer"),
+            groups=["admin"],
+        )(html.Div("Admin"))
+
+    app = Dash(__name__)
+    app.layout = layout
+    BasicAuth(
+        app,
+        {"alice": "pwd", "bob": "pwd", "carol": "pwd"},
+        user_groups={
+            "alice": ["admin", "viewers"],
+            "bob": ["viewers", "admin"],
+            "carol": ["viewers"],
+        },
+        secret_key="Test!",
+    )
+    layout_cache = LayoutCache(app)
+
+    def get_layout(username):
+        resp = app.server.test_client().get(
+            "/_dash-layout", headers=basic_auth_header(username, "pwd")
+        )
+        assert resp.status_code == 200
+        return resp.json["props"]["children"]
+
+    # Dash validates the layout on its first request
+    app.server.test_client().get("/")
+    builds.clear()
+    assert get_layout("alice") == "Admin"
+    assert get_layout("bob") == "Admin"
+    assert get_layout("carol") == "Viewer"
+    assert get_layout("carol") == "Viewer"
+    assert builds == [["admin", "viewers"], ["viewers"]]
+    assert layout_cache.stats()["size"] == 2
+
+    layout_cache.invalidate(["viewers"])
+    assert get_layout("carol") == "Viewer"
+    assert get_layout("alice") == "Admin"
+    assert len(builds) == 3
+
+    # Groups not split from a string are a single group, not characters
+    assert LayoutCache.signature("admin") == ("admin",)
+    assert LayoutCache.signature("admin") != LayoutCache.signature("nadmi")
@@ -0,0 +1,89 @@
+import pytest
+from dash import Dash, html
+
+from dash_auth import BasicAuth, BulkGroupProvider, GroupIndex
+
+from .conftest import basic_auth_header
+
+
+class Provider(BulkGroupProvider):
+    def __init__(self):
+        self.groups = {"a": ["admin", "users"], "b": ["users", "admin"]}
+        self.version = 0
+        self.changes = {}
+        self.calls = []
+
+    def load_all(self):
+        self.calls.append("load_all")
+        return dict(self.groups), self.version
+
+    def changes_since(self, token):
+        self.calls.append("changes_since")
+        if token < self.version - 1:
+            raise LookupError("Expired sync token")
+        return self.changes, self.version
+
+
+def test_gi001_group_index():
+    # load_all is required
+    with pytest.raises(TypeError):
+        BulkGroupProvider()
+
+    provider = Provider()
+    index = GroupIndex(provider, refresh_interval=0)
+    assert index("a") == ["admin", "users"]
+    assert index("unknown") == []
+    # Identical group lists are shared
+    assert index.stats()["group_lists"] == 1
+
+    provider.version = 1
+    provider.changes = {"a": ["users"], "b": None, "c": ["users"]}
+    index.refresh()
+    assert index("a") == index("c") == ["users"]
+    assert "b" not in index
+    assert index.stats()["group_lists"] == 1
+    assert provider.calls == ["load_all", "changes_since"]
+
+    # Expired token: full reload
+    provider.version = 5
+    index.refresh()
+    assert provider.calls[-2:] == ["changes_since", "load_all"]
+    assert index("b") == ["admin", "users"]
+
+    # Periodic full reload
+    index.full_reload_interval = 0
+    index.refresh()
+    assert provider.calls[-1] == "load_all"
+    assert index.stats()["reloads"] == 3
+
+    # Providers without incremental updates are fully reloaded
+    class FullProvider(BulkGroupProvider):
+        def load_all(self):
+            return {"a": ["users"]}, 0
+
+    index = GroupIndex(FullProvider(), refresh_interval=0)
+    index.refresh()
+    assert index.stats()["reloads"] == 2
+    assert index.stats()["refreshes"] == 0
+
+
+def test_gi002_basic_auth_group_index():
+    provider = Provider()
+    app = Dash(__name__)
+    app.layout = html.Div()
+    BasicAuth(
+        app,
+        {"a": "password"},
+        user_groups=GroupIndex(provider, refresh_interval=0),
+        secret_key="secret",
+        callback_timeout=1,
+    )
+    client = app.server.test_client()
+    for _ in range(2):
+        response = client.get(
+            "/_dash-layout", headers=basic_auth_header("a", "password")
+        )
+        assert response.status_code == 200
+    assert provider.calls == ["load_all"]
+    with client.session_transaction() as session:
+        assert session["user"]["groups"] == ["admin", "users"]
@@ -0,0 +1,83 @@
+from dash import Dash, html
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+from werkzeug.test import Client
+
+from dash_auth import AuthMiddleware, BasicAuth
+
+from .conftest import basic_auth_header
+
+
+def test_mw001_middleware_short_circuit():
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    auth = BasicAuth(app, {"hello": "world"}, public_routes=["/home"])
+
+    dispatched = []
+    flask_wsgi_app = app.server.wsgi_app
+
+    def counted_wsgi_app(environ, start_response):
+        dispatched.append(environ["PATH_INFO"])
+        return flask_wsgi_app(environ, start_response)
+
+    app.server.wsgi_app = AuthMiddleware(counted_wsgi_app, auth)
+    client = Client(app.server)
+
+    # Public routes are passed through
+    assert client.get("/_dash-layout").status_code == 200
+    assert client.get("/home").status_code == 200
+    assert dispatched == ["/_dash-layout", "/home"]
+
+    # Requests without credentials never reach Flask
+    assert client.get("/").status_code == 401
+    assert len(dispatched) == 2
+
+    # Rejected credentials are only checked once
+    bad_credentials = basic_auth_header("hello", "password")
+    assert client.get("/", headers=bad_credentials).status_code == 401
+    assert client.get("/", headers=bad_credentials).status_code == 401
+    assert len(dispatched) == 3
+
+    assert client.get(
+        "/", headers=basic_auth_header("hello", "world")
+    ).status_code == 200
+
+
+def test_mw002_middleware_dispatcher():
+    app1 = Dash(__name__)
+    app1.layout = html.Div("App 1")
+    auth1 = BasicAuth(
+        app1, {"user1": "pwd1"}, public_routes=["/<path:p>/report"]
+    )
+    app2 = Dash(__name__, requests_pathname_prefix="/app2/")
+    app2.layout = html.Div("App 2")
+
+    @app2.server.route("/secret/report")
+    def secret_report():
+        return "Secret"
+    auth2 = BasicAuth(app2, {"user2": "pwd2"}, public_routes=["/public"])
+
+    middleware = AuthMiddleware(
+        DispatcherMiddleware(app1.server, {"/app2": app2.server}),
+        {"": auth1, "/app2": auth2},
+    )
+    client = Client(middleware)
+
+    assert client.get("/_dash-layout").status_code == 200
+    assert client.get("/app2/_dash-layout").status_code == 200
+    assert client.get("/app2/public").status_code == 200
+    assert client.get("/public").status_code == 401
+    # Public routes of a mount do not apply to the paths of other mounts
+    assert client.get("/app2/secret/report").status_code == 401
+    assert client.get(
+        "/app2/secret/report", headers=basic_auth_header("user2", "pwd2")
+    ).status_code == 200
+    assert client.get("/app2/").status_code == 401
+    assert client.get(
+        "/app2/", headers=basic_auth_header("user1", "pwd1")
+    ).status_code == 401
+    assert client.get(
+        "/app2/", headers=basic_auth_header("user2", "pwd2")
+    ).status_code == 200
+    assert client.get(
+        "/", headers=basic_auth_header("user1", "pwd1")
+    ).status_code == 200
@@ -1,14 +1,24 @@
+import multiprocessing
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
+from urllib.parse import parse_qs, unquote, urlparse
 
+import pytest
 import requests
 from dash import Dash, Input, Output, dcc, html
 from flask import redirect
 
+from benchmarks.oidc_login import run as run_login_benchmark
 from dash_auth import (
+    get_user,
+    list_groups,
     protected_callback,
+    IdPDiscovery,
     OIDCAuth,
 )
+from dash_auth.revocation import RevocationList
 
 
 def valid_authorize_redirect(_, redirect_uri, *args, **kwargs):
@@ -186,3 +196,354 @@ def test_oa003_oidc_auth_login_several_idp(dash_br, dash_thread_server):
     dash_br.driver.get(os.path.join(base_url, "oidc/idp2/login"))
     dash_br.driver.get(base_url)
     dash_br.wait_for_text_to_equal("#output1", "initial value")
+
+
+def test_oa004_oidc_auth_pooled_connections(oidc_provider):
+    app = Dash(__name__)
+    oidc = OIDCAuth(app, secret_key="Test", http_pool_maxsize=2)
+    oidc_provider.register(oidc, "oidc")
+    client = oidc.get_oauth_client("oidc")
+    for _ in range(5):
+        client.server_metadata.pop("_loaded_at", None)
+        assert client.load_server_metadata()["issuer"] == oidc_provider.url
+
+    stats = oidc.pool_stats()["oidc"]
+    assert stats["requests"] == 5
+    assert stats["errors"] == 0
+    assert stats["connections"] == 1
+
+    # Alternating between the hosts of a provider keeps their connections
+    session = requests.Session()
+    session.mount("http://", oidc._http_adapters["oidc"])
+    urls = [
+        oidc_provider.metadata_url,
+        oidc_provider.metadata_url.replace("127.0.0.1", "localhost"),
+    ]
+    for _ in range(3):
+        for url in urls:
+            assert session.get(url).status_code == 200
+    assert oidc.pool_stats()["oidc"]["connections"] == 2
+
+
+def test_oa005_oidc_auth_bounded_login_states():
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    oidc = OIDCAuth(app, secret_key="Test", max_login_states=3)
+    oidc.register_provider(
+        "oidc",
+        client_id="<client-id>",
+        client_secret="<client-secret>",
+        authorize_url="https://idp.com/oidc/authorize",
+        access_token_url="https://idp.com/oidc/token",
+    )
+
+    with app.server.test_client() as client:
+        for _ in range(10):
+            assert client.get("/oidc/oidc/login").status_code == 302
+        with client.session_transaction() as session:
+            states = [k for k in session if k.startswith("_state_oidc_")]
+        assert len(states) == 3
+
+        # The most recent login attempt is still valid
+        redirect_url = client.get("/oidc/oidc/login").headers["Location"]
+        state = parse_qs(urlparse(redirect_url).query)["state"][0]
+        with client.session_transaction() as session:
+            assert f"_state_oidc_{state}" in session
+            assert len(
+                [k for k in session if k.startswith("_state_oidc_")]
+            ) == 3
+
+
+def test_oa006_oidc_auth_login_flow_fake_provider(oidc_provider):
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    oidc = OIDCAuth(app, secret_key="Test")
+    oidc_provider.register(oidc)
+
+    with app.server.test_client() as client:
+        assert client.get("/").status_code == 302
+        resp = requests.get(
+            client.get("/").headers["Location"], allow_redirects=False
+        )
+        callback = urlparse(resp.headers["Location"])
+        resp = client.get(f"{callback.path}?{callback.query}")
+        assert resp.status_code == 302
+        assert client.get("/").status_code == 200
+        with client.session_transaction() as session:
+            assert session["user"]["email"] == "a.b@mail.com"
+            assert session["user"]["groups"] == ["viewer", "editor"]
+            assert session["idp"] == "idp"
+    assert oidc_provider.calls["/token"] == 1
+
+
+def test_oa007_oidc_login_benchmark():
+    report = run_login_benchmark(logins=8, concurrency=4)
+    assert report["logins_per_sec"] > 0
+    assert report["pool"]["errors"] == 0
+    assert report["pool"]["connections"] <= 4
+
+
+def test_oa008_oidc_auth_token_introspection(oidc_provider):
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+
+    @app.server.route("/whoami")
+    def whoami():
+        return {"email": get_user()["email"], "groups": list_groups()}
+
+    oidc = OIDCAuth(app, secret_key="Test", token_introspection=True)
+    oidc_provider.register(oidc)
+    oidc_provider.introspection_delay = 0.2
+    token = oidc_provider.issue_access_token("a.b")
+
+    def call(token):
+        with app.server.test_client() as client:
+            return client.get(
+                "/whoami", headers={"Authorization": f"Bearer {token}"}
+            )
+
+    # Concurrent requests with the same token trigger a single introspection
+    with ThreadPoolExecutor(8) as executor:
+        responses = list(executor.map(call, [token] * 8))
+    assert all(resp.status_code == 200 for resp in responses)
+    assert responses[0].json == {
+        "email": "a.b@mail.com", "groups": ["viewer", "editor"]
+    }
+    assert oidc_provider.calls["/introspect"] == 1
+    assert "Set-Cookie" not in responses[0].headers
+
+    # Results are cached
+    oidc_provider.revoke_access_token(token)
+    assert call(token).status_code == 200
+    assert oidc_provider.calls["/introspect"] == 1
+
+    resp = call("invalid")
+    assert resp.status_code == 401
+    assert "invalid_token" in resp.headers["WWW-Authenticate"]
+    assert oidc_provider.calls["/introspect"] == 2
+
+    # Tokens issued to other clients of the provider are rejected
+    other_token = oidc_provider.issue_access_token("a.b", client_id="other")
+    assert call(other_token).status_code == 401
+    oidc.introspection_audience = "other"
+    assert call(oidc_provider.issue_access_token(
+        "a.b", client_id="other"
+    )).status_code == 200
+
+    with pytest.raises(ValueError):
+        OIDCAuth(
+            Dash(__name__),
+            secret_key="Test",
+            token_introspection=True,
+            tenants={"a.example.com": {"idp": {}}},
+        )
+
+
+def test_oa009_oidc_auth_session_revocation(oidc_provider, tmp_path):
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    oidc = OIDCAuth(
+        app, secret_key="Test", revocation_list=str(tmp_path / "revoked.db")
+    )
+    oidc_provider.register(oidc)
+
+    def login(client):
+        resp = requests.get(
+            client.get("/").headers["Location"], allow_redirects=False
+        )
+        callback = urlparse(resp.headers["Location"])
+        client.get(f"{callback.path}?{callback.query}")
+        assert client.get("/").status_code == 200
+
+    client = app.server.test_client()
+    other_client = app.server.test_client()
+    login(client)
+    login(other_client)
+    # Copy the session cookie, as if it was stolen
+    cookie = client.get_cookie("session").value
+    assert client.get("/oidc/logout").status_code == 200
+
+    stolen_client = app.server.test_client()
+    stolen_client.set_cookie("session", cookie)
+    assert stolen_client.get("/").status_code == 302
+
+    # Another worker sharing the revocation list
+    worker_list = RevocationList(
+        str(tmp_path / "revoked.db"), sync_interval=0
+    )
+    with other_client.session_transaction() as session:
+        other_sid = session["sid"]
+    assert not worker_list.is_revoked(other_sid)
+    oidc.revoke_session(other_sid)
+    assert worker_list.is_revoked(other_sid)
+    assert other_client.get("/").status_code == 302
+
+
+def test_oa010_revocation_list_bloom_filter(tmp_path):
+    revocation_list = RevocationList(
+        str(tmp_path / "revoked.db"), capacity=10
+    )
+    revocation_list.revoke(*[f"sid{i}" for i in range(100)])
+    assert revocation_list._bloom.capacity >= 100
+    assert all(f"sid{i}" in revocation_list for i in range(100))
+    assert not any(f"other{i}" in revocation_list for i in range(100))
+
+    # Forked workers open their own connection
+    parent_conn = revocation_list._connection()
+
+    def worker():
+        assert revocation_list._connection() is not parent_conn
+        revocation_list.revoke("forked")
+
+    process = multiprocessing.get_context("fork").Process(target=worker)
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    assert revocation_list._connection() is parent_conn
+    revocation_list.sync()
+    assert "forked" in revocation_list
+
+
+def test_oa011_oidc_auth_idp_discovery(oidc_provider):
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    oidc = OIDCAuth(
+        app,
+        secret_key="Test",
+        idp_selection_route="/select",
+        public_routes=["/select"],
+        idp_discovery=IdPDiscovery(
+            domains={"corp.com": "corp"},
+            path_prefixes={"/partners": "partners"},
+        ),
+    )
+    oidc_provider.register(oidc, "corp")
+    oidc_provider.register(oidc, "partners")
+
+    def login_redirect(client, path):
+        resp = client.get(path)
+        assert resp.status_code == 302
+        location = urlparse(resp.headers["Location"])
+        if location.path == "/select":
+            return "/select", None
+        query = parse_qs(location.query)
+        idp = urlparse(query["redirect_uri"][0]).path.split("/")[2]
+        return idp, query.get("login_hint", [None])[0]
+
+    client = app.server.test_client()
+    assert login_redirect(client, "/") == ("/select", None)
+    assert login_redirect(client, "/?login_hint=jane@eu.corp.com") == (
+        "corp", "jane@eu.corp.com"
+    )
+    assert login_redirect(client, "/partners/report") == ("partners", None)
+
+    # A successful login remembers the provider in the browser
+    resp = requests.get(
+        client.get("/partners").headers["Location"], allow_redirects=False
+    )
+    callback = urlparse(resp.headers["Location"])
+    resp = client.get(f"{callback.path}?{callback.query}")
+    assert "dash_auth_idp=partners" in resp.headers["Set-Cookie"]
+    client.get("/oidc/logout")
+    assert login_redirect(client, "/") == ("partners", None)
+
+
+def test_oa012_oidc_auth_tenants(oidc_provider):
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    config = dict(
+        token_endpoint_auth_method="client_secret_post",
+        client_id=oidc_provider.client_id,
+        client_secret=oidc_provider.client_secret,
+        server_metadata_url=oidc_provider.metadata_url,
+    )
+    oidc = OIDCAuth(
+        app,
+        secret_key="Test",
+        tenants={
+            "acme.test": {"acme": config},
+            "globex.test:8050": {"globex": config},
+        },
+        tenant_idle_timeout=60,
+    )
+    # Tenant providers are registered on first use
+    assert not oidc.oauth._registry
+
+    acme = app.server.test_client()
+    resp = acme.get("/", base_url="http://acme.test")
+    assert "/oidc/acme/callback" in unquote(resp.headers["Location"])
+    assert list(oidc.oauth._registry) == ["acme"]
+    callback = urlparse(requests.get(
+        resp.headers["Location"], allow_redirects=False
+    ).headers["Location"])
+    acme.get(
+        f"{callback.path}?{callback.query}", base_url="http://acme.test"
+    )
+    assert acme.get("/", base_url="http://acme.test").status_code == 200
+
+    # Providers of other tenants are not available, and sessions are only
+    # valid on the hosts of their tenant
+    resp = acme.get("/oidc/globex/login", base_url="http://acme.test")
+    assert "/oidc/acme/callback" in unquote(resp.headers["Location"])
+    session_cookie = acme.get_cookie("session", domain="acme.test")
+    globex = app.server.test_client()
+    globex.set_cookie("session", session_cookie.value, domain="globex.test")
+    resp = globex.get("/", base_url="http://globex.test:8050")
+    assert resp.status_code == 302
+    assert "/oidc/globex/callback" in unquote(resp.headers["Location"])
+    assert list(oidc.oauth._registry) == ["acme", "globex"]
+    assert globex.get("/", base_url="http://unknown.test").status_code == 404
+
+    # Idle tenant providers are unregistered
+    oidc.tenant_idle_timeout = 0
+    globex.get("/", base_url="http://globex.test:8050")
+    assert list(oidc.oauth._registry) == ["globex"]
+
+
+def test_oa013_oidc_auth_session_lifetime(oidc_provider):
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    oidc = OIDCAuth(
+        app,
+        secret_key="Test",
+        session_idle_timeout=600,
+        session_max_lifetime=3600,
+    )
+    oidc_provider.register(oidc)
+    client = app.server.test_client()
+    resp = requests.get(
+        client.get("/").headers["Location"], allow_redirects=False
+    )
+    callback = urlparse(resp.headers["Location"])
+    resp = client.get(f"{callback.path}?{callback.query}")
+    assert "Expires=" in resp.headers["Set-Cookie"]
+    with client.session_transaction() as session:
+        expires_at = session["expires_at"]
+        assert expires_at - session["created_at"] == 600
+
+    # The cookie is not sent again while the session has time left
+    resp = client.get("/")
+    assert resp.status_code == 200
+    assert "Set-Cookie" not in resp.headers
+
+    # Less than half the idle timeout left: the session is extended
+    with client.session_transaction() as session:
+        session["expires_at"] = int(time.time()) + 100
+    resp = client.get("/")
+    assert resp.status_code == 200
+    assert "Set-Cookie" in resp.headers
+    with client.session_transaction() as session:
+        assert session["expires_at"] >= int(time.time()) + 599
+        # ...but not past the absolute lifetime
+        session["created_at"] = int(time.time()) - 3500
+        session["expires_at"] = int(time.time()) + 100
+    client.get("/")
+    with client.session_transaction() as session:
+        assert session["expires_at"] == session["created_at"] + 3600
+
+    # Expired session
+    with client.session_transaction() as session:
+        session["expires_at"] = int(time.time()) - 1
+    assert client.get("/").status_code == 302
+    with client.session_transaction() as session:
+        assert "user" not in session
@@ -0,0 +1,81 @@
+import os
+import pstats
+import time
+
+from dash import Dash, html
+
+from dash_auth import AuthProfiler, BasicAuth
+
+from .conftest import basic_auth_header
+
+
+def test_pf001_auth_profiler(tmp_path):
+    def auth_func(username, password):
+        if username == "slow":
+            time.sleep(0.2)
+        return password == "pwd"
+
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    auth = BasicAuth(app, auth_func=auth_func)
+    profiler = AuthProfiler(
+        str(tmp_path),
+        threshold=0.05,
+        sample_every=5,
+        sample_interval=0.005,
+        max_files=3,
+    )
+    profiler.instrument(auth)
+    client = app.server.test_client()
+
+    def get(username):
+        return client.get(
+            "/", headers=basic_auth_header(username, "pwd")
+        ).status_code
+
+    # Fast requests are only timed
+    for _ in range(4):
+        assert get("fast") == 200
+    assert os.listdir(tmp_path) == []
+
+    # The 5th request is profiled with cProfile, slow requests are sampled
+    assert get("slow") == 200
+    files = sorted(os.listdir(tmp_path))
+    assert [os.path.splitext(f)[1] for f in files] == [".prof", ".stacks"]
+    stats = pstats.Stats(str(tmp_path / files[0]))
+    assert any(func[2] == "auth_func" for func in stats.stats)
+    stacks = (tmp_path / files[1]).read_text()
+    assert stacks.startswith("# before_request_auth / ")
+    assert "auth_func (test_profiling.py" in stacks
+
+    # Old profiles are rotated
+    for _ in range(3):
+        get("slow")
+    assert len(os.listdir(tmp_path)) == 3
+    stats = profiler.stats()
+    assert stats["calls"] == 8
+    assert stats["slow"] == 4
+    assert stats["profiles"] == 5
+
+
+def test_pf002_auth_profiler_failures_and_idle(tmp_path):
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    auth = BasicAuth(app, {"user": "pwd"})
+    profiler = AuthProfiler(str(tmp_path), threshold=0.05)
+    profiler.instrument(auth)
+
+    def fail(*args):
+        raise RuntimeError("Broken profile")
+
+    profiler._record = fail
+    # Recording errors do not fail the profiled request
+    assert app.server.test_client().get(
+        "/", headers=basic_auth_header("user", "pwd")
+    ).status_code == 200
+
+    # The watchdog waits for running calls instead of polling
+    deadline = time.monotonic() + 1
+    while profiler._active.is_set() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not profiler._active.is_set()
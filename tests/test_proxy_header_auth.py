@@ -0,0 +1,39 @@
+from dash import Dash, html
+from flask import jsonify
+
+from dash_auth import ProxyHeaderAuth, get_user
+
+
+def test_ph001_proxy_header_auth():
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    app.server.secret_key = "Test"
+
+    @app.server.route("/user")
+    def user():
+        return jsonify(get_user())
+
+    ProxyHeaderAuth(app, trusted_proxies=["10.0.0.0/8", "127.0.0.1"])
+    client = app.server.test_client()
+    headers = {
+        "X-Forwarded-User": "alice",
+        "X-Forwarded-Groups": "admin, editors,",
+    }
+
+    def get(remote_addr, headers):
+        return client.get(
+            "/user",
+            headers=headers,
+            environ_base={"REMOTE_ADDR": remote_addr},
+        )
+
+    resp = get("10.1.2.3", headers)
+    assert resp.status_code == 200
+    assert resp.json == {"email": "alice", "groups": ["admin", "editors"]}
+    assert "Set-Cookie" not in resp.headers
+    assert get("127.0.0.1", {"X-Forwarded-User": "bob"}).json == {
+        "email": "bob", "groups": []
+    }
+    # Headers from untrusted addresses are ignored
+    assert get("192.168.1.1", headers).status_code == 401
+    assert get("10.1.2.3", {}).status_code == 401
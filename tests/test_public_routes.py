@@ -0,0 +1,95 @@
+import threading
+
+from dash import Dash, html
+
+from dash_auth import BasicAuth, add_public_routes
+from dash_auth.public_routes import get_public_registry
+
+
+def test_pr001_public_registry_snapshots():
+    app = Dash(__name__)
+    app.layout = html.Div("Hello")
+    BasicAuth(app, {"hello": "world"}, public_routes=["/home"])
+    registry = get_public_registry(app)
+    snapshot = registry.snapshot
+    assert snapshot.routes.test("/home")
+    assert snapshot.routes.test("/_dash-layout")
+
+    # Snapshots are immutable, registrations publish new ones
+    add_public_routes(app, ["/late/<page>"])
+    registry.add_callbacks(["output.children"])
+    assert not snapshot.routes.test("/late/page")
+    assert registry.snapshot.routes.test("/late/page")
+    assert registry.snapshot.callbacks == {"output.children"}
+    assert registry.snapshot.version == snapshot.version + 2
+
+    client = app.server.test_client()
+    errors = []
+
+    def read():
+        for _ in range(200):
+            if client.get("/home").status_code != 200:
+                errors.append("/home")
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(50):
+        add_public_routes(app, [f"/page-{i}"])
+    for reader in readers:
+        reader.join()
+    assert not errors
+    assert client.get("/page-49").status_code == 200
+    assert client.get("/private").status_code == 401
+
+
+def test_pr002_routing_callback_index():
+    from dash import Input, Output, dcc
+
+    from dash_auth.callback_index import UNKNOWN
+
+    app = Dash(__name__)
+    app.layout = html.Div([
+        dcc.Location(id="url"),
+        dcc.Input(id="search"),
+        html.Div(id="page"),
+        html.Div(id="echo"),
+    ])
+    auth = BasicAuth(app, {"hello": "world"}, public_routes=["/home"])
+
+    @app.callback(
+        Output("page", "children"),
+        Input("search", "value"),
+        Input("url", "pathname"),
+    )
+    def route(search, pathname):
+        return pathname
+
+    @app.callback(Output("echo", "children"), Input("search", "value"))
+    def echo(search):
+        return search
+
+    index = auth.routing_callbacks
+    assert index.pathname_position("page.children") == 1
+    assert index.pathname_position("echo.children") is None
+    assert index.pathname_position("other.children") == UNKNOWN
+
+    client = app.server.test_client()
+
+    def call(output, inputs):
+        return client.post("/_dash-update-component", json={
+            "output": output,
+            "outputs": {"id": output.split(".")[0], "property": "children"},
+            "inputs": inputs,
+            "changedPropIds": [],
+            "state": [],
+        }).status_code
+
+    search = {"id": "search", "property": "value", "value": "x"}
+    assert call("page.children", [
+        search, {"id": "url", "property": "pathname", "value": "/home"}
+    ]) == 200
+    assert call("page.children", [
+        search, {"id": "url", "property": "pathname", "value": "/private"}
+    ]) == 401
+    assert call("echo.children", [search]) == 401
@@ -0,0 +1,110 @@
+import multiprocessing
+import time
+
+import pytest
+from dash import Dash, html
+
+from dash_auth import BasicAuth, SharedMemoryCache
+
+from .conftest import basic_auth_header
+
+
+def _set_in_child(path):
+    cache = SharedMemoryCache(path, slots=64, hash_key="secret")
+    cache.set(("groups", "user"), ["admin"])
+    cache.close()
+
+
+def test_sc001_shared_memory_cache(tmp_path):
+    path = str(tmp_path / "dash-auth.cache")
+    cache = SharedMemoryCache(path, slots=64, ttl=60, hash_key="secret")
+    assert cache.get("missing") is None
+
+    # Entries written by another process are visible
+    process = multiprocessing.get_context("fork").Process(
+        target=_set_in_child, args=(path,)
+    )
+    process.start()
+    process.join()
+    cache = SharedMemoryCache(path, slots=64, hash_key="secret")
+    assert cache.get(("groups", "user")) == ["admin"]
+    # Keys are hashed with a secret which is not in the file
+    other_key = SharedMemoryCache(path, slots=64, hash_key="other")
+    assert other_key.get(("groups", "user")) is None
+    with open(path, "rb") as f:
+        assert b"secret" not in f.read()
+
+    # Expiry, deletion and values too large for a slot
+    cache.set("short", 1, ttl=0.05)
+    assert cache.get("short") == 1
+    time.sleep(0.1)
+    assert "short" not in cache
+    cache.delete(("groups", "user"))
+    assert cache.get(("groups", "user")) is None
+    cache.set("large", "x" * 1000)
+    assert "large" not in cache
+
+    # A slot being written is a miss
+    cache.set("key", "value")
+    offset = cache._victim(cache._digest("key"))
+    cache._mmap[offset + 32] ^= 0xff
+    assert cache.get("key") is None
+
+    # Filling the table evicts the entries expiring first
+    for i in range(200):
+        cache.set(f"key{i}", i, ttl=i)
+    assert cache.get("key199") == 199
+    assert cache.get("key0") is None
+
+    # The credentials are not stored in the file
+    cache.set(("verdict", "user", "p4ssw0rd"), True)
+    with open(path, "rb") as f:
+        assert b"p4ssw0rd" not in f.read()
+
+
+def test_sc002_basic_auth_shared_cache(tmp_path):
+    calls = []
+
+    def auth_func(username, password):
+        calls.append(("auth", username))
+        return password == "password"
+
+    def user_groups(username):
+        calls.append(("groups", username))
+        return ["admin"]
+
+    clients = []
+    # Two apps standing for two workers of the same host
+    for _ in range(2):
+        app = Dash(__name__)
+        app.layout = html.Div()
+        BasicAuth(
+            app,
+            auth_func=auth_func,
+            user_groups=user_groups,
+            secret_key="secret",
+            shared_cache=SharedMemoryCache(str(tmp_path / "cache")),
+        )
+        clients.append(app.server.test_client())
+
+    def get(client, password):
+        return client.get(
+            "/_dash-layout", headers=basic_auth_header("user", password)
+        ).status_code
+
+    assert get(clients[0], "password") == 200
+    assert get(clients[1], "password") == 200
+    assert calls == [("auth", "user"), ("groups", "user")]
+    # Failed verifications are not cached
+    assert get(clients[0], "wrong") == 401
+    assert get(clients[1], "wrong") == 401
+    assert calls[2:] == [("auth", "user"), ("auth", "user")]
+
+    # The keys cannot be hashed without a secret
+    app = Dash(__name__)
+    with pytest.raises(ValueError):
+        BasicAuth(
+            app,
+            auth_func=auth_func,
+            shared_cache=SharedMemoryCache(str(tmp_path / "other")),
+        )